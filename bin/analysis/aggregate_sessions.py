@@ -0,0 +1,381 @@
+# Study dataset
+# Collects every CRCP and PSAP session log in data/crcp and data/psap (and
+# data/tests with --tests) into one typed dataset per task, plus
+# per-participant summaries:
+# - crcp_trials.parquet, psap_trials.parquet: every logged row, typed with
+#   the task schemas of session_schema.py (sentinels such as 99 and "none"
+#   become nulls, key lists become the key), with a session column
+# - sessions.csv: one row per session with its file, participant, condition,
+#   CRCP hazard model and the first row and number of rows it takes in the
+#   trials file
+# - crcp_participants.csv: decks, outcomes, adjusted draws (mean draws on
+#   decks that were cashed out), points banked and mean reaction time per
+#   participant, risk level and hazard model. A deck is lost when its last
+#   draw showed the bad card; decks left unfinished when a session was quit
+#   are counted apart and left out of the other deck counts
+# - psap_participants.csv: earn, deduct and protect counts and rates (per
+#   choice and per minute), mean reaction time and mean time between presses
+#   per participant and condition
+#
+# Reaction times are only logged since schema version 3; older sessions
+# count towards every summary but the reaction times. CRCP sessions logged
+# before schema version 4 have no hazard column; they ran the "baseline"
+# hazard model and are summarized with the later sessions of that model.
+#
+# Session files are parsed in parallel by a process pool. The run is
+# incremental: manifest.json keeps the size, mtime and hash of every file
+# already ingested, files that did not change are skipped, and only the rows
+# of new or changed sessions are replaced in the trials files.
+#
+# From the repository root:
+#     python bin/analysis/aggregate_sessions.py
+#     python bin/analysis/aggregate_sessions.py --tests --out data/study --workers 8
+
+import argparse
+import csv
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+DIR_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIR_TASK = os.path.join(DIR_ROOT, "bin", "task")
+DIR_DATA = os.path.join(DIR_ROOT, "data")
+
+sys.path.insert(0, DIR_TASK)
+
+from helpers import session_schema
+
+MANIFEST_VERSION = 5
+
+TASK_DIRS       = {"crcp": "crcp", "psap": "psap"}
+TEST_DIR        = "tests"
+BASELINE_HAZARD = "baseline"  # hazard model of CRCP sessions logged without a hazard column
+ACTION_KEYS     = ["s", "h", "l"]  # keys of the action_01-03 columns, as KEY_LIST in psap.py
+
+
+def discover(data_dir = DIR_DATA, tests = False):
+    """Session csv files of every task, as (task, path) pairs."""
+    dirs  = [os.path.join(data_dir, task_dir) for task_dir in TASK_DIRS.values()]
+    dirs += [os.path.join(data_dir, TEST_DIR)] if tests else []
+
+    files = []
+    for directory in dirs:
+        for task in TASK_DIRS:
+            files.extend((task, path) for path in sorted(glob.glob(os.path.join(directory, f"{task}-*.csv"))))
+    return files
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as session_file:
+        for block in iter(lambda: session_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def session_info(task, path):
+    """Session name, participant id and condition from a log file name.
+
+    crcp-<id>-<date_time>.csv and psap-<id>-<condition>-<date_time>.csv
+    """
+    session = os.path.splitext(os.path.basename(path))[0]
+    parts   = session.split("-")
+    return {"session":   session,
+            "task":      task,
+            "id":        parts[1],
+            "condition": parts[2] if task == "psap" else None,
+            "practice":  os.path.basename(os.path.dirname(path)) == TEST_DIR}
+
+
+def read_session(path, schema):
+    """Header and raw logged columns of a session file; columns the file predates are empty."""
+    with open(path, newline = "") as session_file:
+        rows = list(csv.reader(session_file, skipinitialspace = True))
+
+    header  = [column.strip() for column in rows[0]] if rows else []
+    rows    = [row for row in rows[1:] if row]
+    columns = {}
+    for name, _, _ in schema:
+        position = header.index(name) if name in header else None
+        columns[name] = [row[position] if position is not None and position < len(row) else "" for row in rows]
+    return header, columns
+
+
+def typed_columns(columns, schema):
+    return {name: [session_schema.convert(kind, value, nulls) for value in columns[name]] for name, kind, nulls in schema}
+
+
+def crcp_summary(rows):
+    """Deck outcomes and draws per risk level of a CRCP session.
+
+    The last row of a deck is its cash-out (choice 0), its time-out (no
+    choice), the draw of the bad card, or a good draw when the session was
+    quit before the deck ended (unfinished).
+    """
+    last_rows = {}
+    for i, deck_number in enumerate(rows["deck_number"]):
+        last_rows[deck_number] = i
+
+    levels = {risk: {"decks": 0, "cashed_out": 0, "lost": 0, "timed_out": 0, "unfinished": 0, "draws": 0,
+                     "cashout_draws": 0, "banked": 0.0, "responses": 0, "rt_sum": 0.0} for risk in set(rows["risk"])}
+
+    for risk, rt in zip(rows["risk"], rows["rt"]):
+        if rt is not None:
+            levels[risk]["responses"] += 1
+            levels[risk]["rt_sum"]    += rt
+
+    for i in last_rows.values():
+        level = levels[rows["risk"][i]]
+        if rows["choice"][i] == 0:
+            level["cashed_out"]    += 1
+            level["cashout_draws"] += rows["draw"][i]
+            level["banked"]        += rows["pot"][i]
+        elif rows["choice"][i] is None:
+            level["timed_out"] += 1
+        elif rows["card"][i] == "bad":
+            level["lost"] += 1
+        else:
+            level["unfinished"] += 1
+            continue
+
+        level["decks"] += 1
+        level["draws"] += rows["draw"][i]
+    return levels
+
+
+def psap_summary(rows):
+    """Choices per action, incidents, duration and response times of a PSAP session."""
+    summary = {"choices": 0, "Earn": 0, "Deduct": 0, "Protect": 0, "incidents": 0, "minutes": 0.0,
+               "responses": 0, "rt_sum": 0.0, "intervals": 0, "interval_sum": 0.0}
+    for i, key in enumerate(rows["choice"]):
+        if key not in ACTION_KEYS:
+            continue
+        summary["choices"] += 1
+        summary[rows[f"action_0{ACTION_KEYS.index(key) + 1}"][i]] += 1
+
+        if rows["rt"][i] is not None:
+            summary["responses"] += 1
+            summary["rt_sum"]    += rows["rt"][i]
+        if rows["press_times"][i]:
+            summary["intervals"]    += len(rows["press_times"][i]) - 1
+            summary["interval_sum"] += rows["press_times"][i][-1] - rows["press_times"][i][0]
+
+    if rows["n_incidents"]:
+        summary["incidents"] = max(rows["n_incidents"])
+        summary["minutes"]   = max(rows["start"]) / 60
+    return summary
+
+
+SUMMARIES = {"crcp": crcp_summary, "psap": psap_summary}
+
+
+def parse_session(task, path):
+    """Typed trials table and summary of one session file (runs in a worker process)."""
+    import pyarrow as pa
+
+    info    = session_info(task, path)
+    schema  = session_schema.SCHEMAS[task]
+    header, columns = read_session(path, schema)
+    table   = session_schema.to_arrow(schema, columns, task)
+    table   = table.append_column("session", pa.array([info["session"]] * table.num_rows, type = pa.string()))
+
+    info["rows"]    = table.num_rows
+    if task == "crcp":
+        if "hazard" in header:
+            info["hazard"] = next((value for value in columns["hazard"] if value), None)
+        else:
+            info["hazard"] = BASELINE_HAZARD
+    info["summary"] = SUMMARIES[task](typed_columns(columns, schema))
+    return path, info, table
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as manifest_file:
+        manifest = json.load(manifest_file)
+    return manifest["files"] if manifest.get("version") == MANIFEST_VERSION else {}
+
+
+def write_manifest(path, files):
+    with open(path, "w") as manifest_file:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, manifest_file, indent = 1)
+
+
+def changed_files(files, manifest):
+    """Files that are new or changed since they were ingested.
+
+    A file whose size and mtime match the manifest is skipped without reading
+    it; one whose mtime changed but whose content did not only gets its
+    manifest entry updated.
+    """
+    changed = []
+    for task, path in files:
+        stat  = os.stat(path)
+        entry = manifest.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            continue
+
+        digest = file_hash(path)
+        if entry and entry["sha256"] == digest:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            continue
+        changed.append((task, path, stat, digest))
+    return changed
+
+
+def update_trials(path, tables, replaced):
+    """Replace the rows of the replaced sessions in a trials file with the new tables."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    parts = []
+    if os.path.exists(path):
+        existing = pq.read_table(path)
+        if replaced:
+            existing = existing.filter(pc.invert(pc.is_in(existing["session"], pa.array(sorted(replaced)))))
+        parts.append(existing)
+
+    parts.extend(tables)
+    if not parts:
+        return None
+
+    table = pa.concat_tables(parts, promote_options = "permissive").combine_chunks()
+    table = table.sort_by([("session", "ascending")])
+    pq.write_table(table, path)
+    return table
+
+
+def write_csv(rows, path, columns):
+    with open(path, "w", newline = "") as out_file:
+        writer = csv.DictWriter(out_file, fieldnames = columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def participant_summaries(manifest):
+    """Per-participant summary rows of both tasks from the manifest's session summaries."""
+    crcp, psap = {}, {}
+    for entry in manifest.values():
+        if entry["task"] == "crcp":
+            for risk, level in entry["summary"].items():
+                row = crcp.setdefault((entry["id"], risk, entry["hazard"]),
+                                      {"id": entry["id"], "risk": risk, "hazard": entry["hazard"], "sessions": 0,
+                                       "decks": 0, "cashed_out": 0, "lost": 0, "timed_out": 0, "unfinished": 0,
+                                       "draws": 0, "cashout_draws": 0, "banked": 0.0, "responses": 0, "rt_sum": 0.0})
+                row["sessions"] += 1
+                for key in ("decks", "cashed_out", "lost", "timed_out", "unfinished", "draws", "cashout_draws",
+                            "banked", "responses", "rt_sum"):
+                    row[key] += level[key]
+        else:
+            summary = entry["summary"]
+            row = psap.setdefault((entry["id"], entry["condition"]),
+                                  {"id": entry["id"], "condition": entry["condition"], "sessions": 0, "choices": 0,
+                                   "earn": 0, "deduct": 0, "protect": 0, "incidents": 0, "minutes": 0.0,
+                                   "responses": 0, "rt_sum": 0.0, "intervals": 0, "interval_sum": 0.0})
+            row["sessions"]  += 1
+            row["choices"]   += summary["choices"]
+            row["earn"]      += summary["Earn"]
+            row["deduct"]    += summary["Deduct"]
+            row["protect"]   += summary["Protect"]
+            row["incidents"] += summary["incidents"]
+            row["minutes"]   += summary["minutes"]
+            for key in ("responses", "rt_sum", "intervals", "interval_sum"):
+                row[key] += summary[key]
+
+    for row in crcp.values():
+        row["adjusted_draws"] = row["cashout_draws"] / row["cashed_out"] if row["cashed_out"] else None
+        row["mean_draws"]     = row["draws"] / row["decks"] if row["decks"] else None
+        rt_sum = row.pop("rt_sum")
+        row["mean_rt"]        = rt_sum / row["responses"] if row["responses"] else None
+
+    for row in psap.values():
+        for action in ("deduct", "protect"):
+            row[f"{action}_rate"]    = row[action] / row["choices"] if row["choices"] else None
+            row[f"{action}_per_min"] = row[action] / row["minutes"] if row["minutes"] else None
+        rt_sum, interval_sum = row.pop("rt_sum"), row.pop("interval_sum")
+        row["mean_rt"]             = rt_sum / row["responses"] if row["responses"] else None
+        row["mean_press_interval"] = interval_sum / row["intervals"] if row["intervals"] else None
+
+    by_key = lambda item: item[0]
+    return [row for _, row in sorted(crcp.items(), key = by_key)], [row for _, row in sorted(psap.items(), key = by_key)]
+
+
+def aggregate(out_dir, data_dir = DIR_DATA, tests = False, workers = None, rebuild = False):
+    """Ingest new and changed session files. Returns (ingested, skipped, removed) file counts."""
+    os.makedirs(out_dir, exist_ok = True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest      = {} if rebuild else load_manifest(manifest_path)
+
+    files   = discover(data_dir, tests)
+    paths   = {path for _, path in files}
+    removed = {path: manifest.pop(path) for path in list(manifest) if path not in paths}
+    changed = changed_files(files, manifest)
+
+    results = []
+    if changed:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            futures = [pool.submit(parse_session, task, path) for task, path, _, _ in changed]
+            results = [future.result() for future in futures]
+
+    # Sessions whose rows are replaced: changed files and files no longer there
+    replaced = {task: {entry["session"] for entry in removed.values() if entry["task"] == task} for task in TASK_DIRS}
+    tables   = {task: [] for task in TASK_DIRS}
+    for (task, path, stat, digest), (_, info, table) in zip(changed, results):
+        if path in manifest:
+            replaced[task].add(manifest[path]["session"])
+        replaced[task].add(info["session"])
+        tables[task].append(table)
+        manifest[path] = dict(info, size = stat.st_size, mtime_ns = stat.st_mtime_ns, sha256 = digest)
+
+    for task in TASK_DIRS:
+        trials_path = os.path.join(out_dir, f"{task}_trials.parquet")
+        if rebuild and os.path.exists(trials_path):
+            os.remove(trials_path)
+        if tables[task] or replaced[task]:
+            update_trials(trials_path, tables[task], replaced[task])
+
+    # Session index: sessions are stored in name order in the trials files
+    sessions, first_row = [], {task: 0 for task in TASK_DIRS}
+    for path, entry in sorted(manifest.items(), key = lambda item: (item[1]["task"], item[1]["session"])):
+        sessions.append({"session": entry["session"], "task": entry["task"], "id": entry["id"],
+                         "condition": entry["condition"], "hazard": entry.get("hazard"), "practice": entry["practice"],
+                         "path": os.path.relpath(path, DIR_ROOT),
+                         "first_row": first_row[entry["task"]], "rows": entry["rows"]})
+        first_row[entry["task"]] += entry["rows"]
+    write_csv(sessions, os.path.join(out_dir, "sessions.csv"),
+              ["session", "task", "id", "condition", "hazard", "practice", "path", "first_row", "rows"])
+
+    crcp_rows, psap_rows = participant_summaries(manifest)
+    write_csv(crcp_rows, os.path.join(out_dir, "crcp_participants.csv"),
+              ["id", "risk", "hazard", "sessions", "decks", "cashed_out", "lost", "timed_out", "unfinished",
+               "adjusted_draws", "mean_draws", "banked", "mean_rt", "responses", "draws", "cashout_draws"])
+    write_csv(psap_rows, os.path.join(out_dir, "psap_participants.csv"),
+              ["id", "condition", "sessions", "choices", "earn", "deduct", "protect", "deduct_rate", "protect_rate",
+               "deduct_per_min", "protect_per_min", "mean_rt", "mean_press_interval", "incidents", "minutes",
+               "responses", "intervals"])
+
+    write_manifest(manifest_path, manifest)
+    return len(changed), len(files) - len(changed), len(removed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the study dataset from the CRCP and PSAP session logs")
+    parser.add_argument("--data", default = DIR_DATA, help = "data directory with the crcp and psap folders")
+    parser.add_argument("--out", default = os.path.join(DIR_DATA, "study"), help = "output directory")
+    parser.add_argument("--tests", action = "store_true", help = "include the practice runs in data/tests")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--rebuild", action = "store_true", help = "ignore the manifest and ingest every file again")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("pyarrow") is None:
+        print("ERROR: the study dataset is written with pyarrow, install it to aggregate sessions")
+        raise SystemExit(1)
+
+    ingested, skipped, removed = aggregate(args.out, args.data, args.tests, args.workers, args.rebuild)
+    print(f"{ingested} sessions ingested, {skipped} unchanged, {removed} removed")
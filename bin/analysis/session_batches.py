@@ -0,0 +1,128 @@
+# Streaming session reader
+# Reads any number of CRCP or PSAP session logs as a stream of fixed-size,
+# typed Arrow record batches, so analyses over the pooled logs of every site
+# run in constant memory: files are read line by line and at most one batch
+# of rows is held at a time. Columns are typed with the task schemas of
+# session_schema.py, and can be projected to the ones an analysis needs.
+#
+#     for batch in iter_batches(glob.glob("data/psap/psap-*.csv"), columns = ["choice", "start", "end"]):
+#         ...
+#
+# iter_study_batches() streams the trials files written by
+# aggregate_sessions.py the same way.
+#
+# From the repository root:
+#     python bin/analysis/session_batches.py data/psap --columns choice start end --batch-size 10000
+
+import argparse
+import csv
+import glob
+import os
+import sys
+
+DIR_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIR_TASK = os.path.join(DIR_ROOT, "bin", "task")
+
+sys.path.insert(0, DIR_TASK)
+
+from helpers import session_schema
+from helpers.session_log import detect_task
+
+BATCH_SIZE = 65536
+
+
+def to_batch(schema, columns, task, sessions = None):
+    """A typed record batch from raw logged columns, with an optional session column."""
+    import pyarrow as pa
+
+    table = session_schema.to_arrow(schema, columns, task)
+    if sessions is not None:
+        table = table.append_column("session", pa.array(sessions, type = pa.string()))
+    return table.combine_chunks().to_batches()[0]
+
+
+def iter_batches(paths, columns = None, batch_size = BATCH_SIZE, task = None, session_column = True):
+    """Yield typed record batches of up to batch_size rows across session files.
+
+    Every file must be a log of the same task (detected from the first file
+    unless given). columns projects the batches to those columns, in that
+    order; session_column adds the name of the file each row comes from.
+    """
+    schema  = None
+    buffer  = None
+    session = [] if session_column else None
+
+    for path in paths:
+        with open(path, newline = "") as session_file:
+            reader = csv.reader(session_file, skipinitialspace = True)
+            header = [column.strip() for column in next(reader, [])]
+            if not header:
+                continue
+
+            file_task = detect_task(header)
+            if schema is None:
+                task    = task or file_task
+                schema  = session_schema.SCHEMAS[task]
+                if columns is not None:
+                    unknown = [column for column in columns if column not in {name for name, _, _ in schema}]
+                    if unknown:
+                        raise ValueError(f"Unknown {task} columns: {', '.join(unknown)}")
+                    schema = sorted((item for item in schema if item[0] in columns), key = lambda item: columns.index(item[0]))
+                buffer = {name: [] for name, _, _ in schema}
+            elif file_task != task:
+                raise ValueError(f"{path} is a {file_task} log, expected {task}")
+
+            # Columns a file predates are read as empty
+            positions = [(name, header.index(name) if name in header else None) for name, _, _ in schema]
+            name      = os.path.splitext(os.path.basename(path))[0]
+
+            for row in reader:
+                if not row:
+                    continue
+                for column, position in positions:
+                    buffer[column].append(row[position] if position is not None and position < len(row) else "")
+                if session is not None:
+                    session.append(name)
+
+                if len(buffer[schema[0][0]]) >= batch_size:
+                    yield to_batch(schema, buffer, task, session)
+                    buffer  = {column: [] for column in buffer}
+                    session = [] if session_column else None
+
+    if buffer and buffer[schema[0][0]]:
+        yield to_batch(schema, buffer, task, session)
+
+
+def iter_study_batches(path, columns = None, batch_size = BATCH_SIZE):
+    """Yield record batches of a study trials file (Parquet) without loading it whole."""
+    import pyarrow.parquet as pq
+
+    yield from pq.ParquetFile(path).iter_batches(batch_size = batch_size, columns = columns)
+
+
+def session_files(sources):
+    """csv files of the given files and directories, in name order."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(glob.glob(os.path.join(source, "*.csv"))))
+        else:
+            paths.append(source)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Stream session logs as typed record batches")
+    parser.add_argument("sources", nargs = "+", help = "session csv files or directories of one task")
+    parser.add_argument("--columns", nargs = "+", help = "columns to read")
+    parser.add_argument("--batch-size", type = int, default = BATCH_SIZE)
+    args = parser.parse_args()
+
+    n_batches = n_rows = 0
+    for batch in iter_batches(session_files(args.sources), args.columns, args.batch_size):
+        n_batches += 1
+        n_rows    += batch.num_rows
+
+    print(f"{n_rows} rows in {n_batches} batches of up to {args.batch_size} rows")
+    if n_batches:
+        print(batch.schema)
@@ -0,0 +1,87 @@
+# Startup import profile
+# Runs a task script under `python -X importtime` until its setup dialog
+# would be shown (the dialog is replaced by an immediate exit) and reports
+# the time spent importing before the dialog, the slowest top-level imports
+# and the wall time from interpreter start to the dialog. With --modules, it
+# profiles importing the given modules instead, e.g. to see what the tasks
+# now import after the dialog.
+#
+# From the repository root:
+#     python bin/bench/import_profile.py bin/task/psap.py
+#     python bin/bench/import_profile.py --modules psychopy.visual pandas numpy
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Stops a task script at its setup dialog
+DIALOG_PRELUDE = """
+import os, runpy, sys
+from psychopy import gui
+
+def _show(self):
+    sys.exit(0)
+
+gui.Dlg.show = _show
+script = {script!r}
+sys.argv = [script]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name = "__main__")
+"""
+
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us, depth) for every line of an -X importtime report."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile(code):
+    """Run code with -X importtime. Returns (wall time in s, parsed import report)."""
+    start  = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            stderr = subprocess.PIPE, stdout = subprocess.DEVNULL, text = True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return wall, parse_importtime(result.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Import-time profile of a task's startup path")
+    parser.add_argument("script", nargs = "?", help = "task script, profiled up to its setup dialog")
+    parser.add_argument("--modules", nargs = "+", help = "profile importing these modules instead")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs to take the median of")
+    parser.add_argument("--top", type = int, default = 15, help = "slowest top-level imports to list")
+    args = parser.parse_args()
+
+    if args.modules:
+        code = "\n".join(f"import {module}" for module in args.modules)
+    elif args.script:
+        code = DIALOG_PRELUDE.format(script = os.path.abspath(args.script))
+    else:
+        parser.error("give a task script or --modules")
+
+    walls, totals = [], []
+    for _ in range(args.repeat):
+        wall, rows = profile(code)
+        top_level  = [row for row in rows if row[3] == 0]
+        walls.append(wall)
+        totals.append(sum(row[2] for row in top_level) / 1e6)
+
+    print(f"runs:              {args.repeat}")
+    print(f"imports (median):  {statistics.median(totals):.3f} s")
+    print(f"wall (median):     {statistics.median(walls):.3f} s")
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for name, self_us, cumulative_us, _ in sorted(top_level, key = lambda row: -row[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>10.1f}  {name}")
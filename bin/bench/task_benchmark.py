@@ -0,0 +1,304 @@
+# End-to-end task benchmark
+# Runs whole CRCP and PSAP sessions without a participant: every session runs
+# in its own interpreter with the setup dialog answered from the command line,
+# the keyboard replaced by the simulated participant of helpers/key_input.py
+# (FakeKeys), avatar clicks picked at random and, with --headless, the window
+# opened on pyglet's headless (EGL) backend, so nothing is shown on screen.
+# Stimuli are still loaded and drawn for real, so the run covers stimulus
+# loading and the main loops as the lab machines run them.
+#
+# For every session it reports the wall and CPU time, the startup time (until
+# the first frame), the peak resident memory and, per routine, the frame-time
+# percentiles, the CPU time spent producing frames and the dropped frames.
+# Results of the repeats are summarized by their median and can be saved and
+# compared with a previous run, failing when a measure got worse than the
+# tolerance allows.
+#
+# Practice sessions are run unless --full is given. The session files they
+# write are deleted afterwards unless --keep-data is given.
+#
+# From the repository root:
+#     python bin/bench/task_benchmark.py --headless --output bench.json
+#     python bin/bench/task_benchmark.py psap --headless --repeat 3 --baseline bench.json
+
+import argparse
+import json
+import os
+import random
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR_ROOT  = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIR_BENCH = os.path.join(DIR_ROOT, "bin", "bench")
+DIR_TASK  = os.path.join(DIR_ROOT, "bin", "task")
+DIR_DATA  = os.path.join(DIR_ROOT, "data")
+
+TASK_SCRIPTS = {"crcp": "CRCP.py", "psap": "psap.py"}
+DATA_DIRS    = ["crcp", "psap", "tests"]
+
+# Participant ID of benchmark sessions (PSAP only takes numbers)
+PARTICIPANT_ID = "9999"
+
+# Runs one session in a fresh interpreter
+BENCH_PRELUDE = """
+import sys
+sys.path.insert(0, {bench_dir!r})
+from task_benchmark import run_session
+run_session({config!r})
+"""
+
+# Measures compared with a baseline: session measures and per-routine measures
+SESSION_MEASURES = ["wall_s", "cpu_s", "startup_s", "peak_rss_mb"]
+ROUTINE_MEASURES = ["p95_ms", "p99_ms", "cpu_ms"]
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            print("WARNING: psutil is not installed, the peak memory is not measured on this platform")
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_session(config):
+    """Run one task session without a participant and write its measures to config["report"]."""
+    script = config["script"]
+    sys.argv = [script]
+    sys.path.insert(0, os.path.dirname(script))
+    random.seed(config["seed"])
+
+    if config["headless"]:
+        import pyglet
+        pyglet.options["headless"] = True
+
+    from psychopy import core, gui, visual
+
+    from helpers import avatar_grid, deck_tables, key_input
+    from helpers.frame_timing import FrameTimer
+
+    rng    = random.Random(config["seed"])
+    timers = []
+
+    # Setup dialog: answered with the configured fields
+    def show_dialog(dialog):
+        dialog.OK = True
+        return list(config["dialog"])
+
+    gui.Dlg.show = show_dialog
+
+    # Keyboard: simulated participant, whatever KEY_BACKEND the task sets
+    def open_fake_keys(backend, clock):
+        return key_input.FakeKeys(clock, press_interval = config["press_interval"],
+                                  response_time = config["response_time"], stray = config["stray"], rng = rng)
+
+    key_input.open_key_input = open_fake_keys
+
+    # Mouse: the avatar picker gets a click on a random avatar
+    avatar_grid.AvatarGrid.clicked = lambda grid, mouse, button = 0: rng.randrange(len(grid.stims))
+
+    if config["lenient_decks"]:
+        load_deck_tables = deck_tables.load_deck_tables
+        deck_tables.load_deck_tables = lambda paths, deck_sizes, strict = True: load_deck_tables(paths, deck_sizes,
+                                                                                                 strict = False)
+
+    # Every window gets a frame timer as it opens
+    open_window = visual.Window.__init__
+
+    def open_timed_window(win, *args, **kwargs):
+        open_window(win, *args, **kwargs)
+        timers.append(FrameTimer(win, refresh_rate = config["refresh_rate"]))
+
+    visual.Window.__init__ = open_timed_window
+
+    start_time = core.getTime()
+    start_wall = time.perf_counter()
+    start_cpu  = time.process_time()
+    try:
+        runpy.run_path(script, run_name = "__main__")
+    except SystemExit:
+        pass
+    wall = time.perf_counter() - start_wall
+    cpu  = time.process_time() - start_cpu
+
+    timer  = timers[0] if timers else None
+    report = {"wall_s":      round(wall, 3),
+              "cpu_s":       round(cpu, 3),
+              "startup_s":   round(float(timer.times[0]) - start_time, 3) if timer and timer.count else None,
+              "peak_rss_mb": peak_memory_mb(),
+              "frames":      timer.count if timer else 0,
+              "routines":    timer.summary() if timer else []}
+
+    with open(config["report"], "w") as report_file:
+        json.dump(report, report_file)
+
+
+def data_files():
+    """Session files currently in the task data directories."""
+    files = set()
+    for name in DATA_DIRS:
+        directory = os.path.join(DIR_DATA, name)
+        if os.path.isdir(directory):
+            files.update(os.path.join(directory, file) for file in os.listdir(directory))
+    return files
+
+
+def dialog_fields(task, practice, condition):
+    """Answers to a task's setup dialog, in the order of its fields."""
+    practice = "Yes" if practice else "No"
+    if task == "psap":
+        return [PARTICIPANT_ID, condition, practice]
+    return [PARTICIPANT_ID, practice]
+
+
+def benchmark(task, args, seed):
+    """Run one session of task in a fresh interpreter and return its measures."""
+    with tempfile.TemporaryDirectory() as report_dir:
+        config = {"script":         os.path.join(DIR_TASK, TASK_SCRIPTS[task]),
+                  "dialog":         dialog_fields(task, not args.full, args.condition),
+                  "seed":           seed,
+                  "headless":       args.headless,
+                  "refresh_rate":   args.refresh_rate,
+                  "press_interval": args.press_interval,
+                  "response_time":  args.response_time,
+                  "stray":          args.stray,
+                  "lenient_decks":  args.lenient_decks,
+                  "report":         os.path.join(report_dir, "report.json")}
+
+        env = dict(os.environ)
+        if args.headless:
+            env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+        before = data_files()
+        result = subprocess.run([sys.executable, "-c", BENCH_PRELUDE.format(bench_dir = DIR_BENCH, config = config)],
+                                stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True, env = env)
+        if not args.keep_data:
+            for path in data_files() - before:
+                os.remove(path)
+
+        if result.returncode != 0 or not os.path.exists(config["report"]):
+            lines = result.stderr.strip().splitlines()
+            raise RuntimeError(f"{task} session failed: {lines[-1] if lines else 'no report written'}")
+
+        with open(config["report"]) as report_file:
+            return json.load(report_file)
+
+
+def median_report(reports):
+    """Median of every measure across repeated sessions of one task."""
+    def median(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    summary = {measure: median(report[measure] for report in reports) for measure in SESSION_MEASURES + ["frames"]}
+    summary["runs"] = len(reports)
+
+    names = []
+    for report in reports:
+        names.extend(row["routine"] for row in report["routines"] if row["routine"] not in names)
+
+    summary["routines"] = []
+    for name in names:
+        rows = [row for report in reports for row in report["routines"] if row["routine"] == name]
+        summary["routines"].append({"routine": name, **{key: median(row[key] for row in rows)
+                                                         for key in rows[0] if key != "routine"}})
+    return summary
+
+
+def regressions(summary, baseline, tolerance):
+    """Measures of summary more than tolerance (a fraction) above those of baseline."""
+    def compare(label, value, base):
+        if value is not None and base and value > base * (1 + tolerance):
+            found.append(f"{label}: {base} -> {value} (+{(value / base - 1) * 100:.0f}%)")
+
+    found = []
+    for measure in SESSION_MEASURES:
+        compare(measure, summary.get(measure), baseline.get(measure))
+
+    base_routines = {row["routine"]: row for row in baseline.get("routines", [])}
+    for row in summary["routines"]:
+        base = base_routines.get(row["routine"])
+        if base is None:
+            continue
+        for measure in ROUTINE_MEASURES:
+            compare(f"{row['routine']} {measure}", row.get(measure), base.get(measure))
+    return found
+
+
+def print_summary(task, summary):
+    def show(value, unit):
+        return "n/a" if value is None else f"{value:.3f} {unit}"
+
+    print(f"{task} ({summary['runs']} runs, median)")
+    print(f"  wall:         {show(summary['wall_s'], 's')}")
+    print(f"  cpu:          {show(summary['cpu_s'], 's')}")
+    print(f"  startup:      {show(summary['startup_s'], 's')}")
+    print(f"  peak memory:  {show(summary['peak_rss_mb'], 'MB')}")
+    print(f"  frames:       {summary['frames']}")
+    print()
+    print(f"  {'routine':<18} {'frames':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cpu ms':>10} {'dropped':>8}")
+    for row in summary["routines"]:
+        print(f"  {row['routine']:<18} {row['frames']:>7.0f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {row['cpu_ms']:>10.1f} {row['dropped']:>8.0f}")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Headless end-to-end benchmark of the task sessions")
+    parser.add_argument("tasks", nargs = "*", help = "tasks to run, crcp and/or psap (default: both)")
+    parser.add_argument("--repeat", type = int, default = 1, help = "sessions per task to take the median of")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the first session")
+    parser.add_argument("--full", action = "store_true", help = "run full sessions instead of practice ones")
+    parser.add_argument("--condition", default = "A", choices = ["A", "B", "C"], help = "PSAP condition")
+    parser.add_argument("--headless", action = "store_true", help = "open the window on pyglet's headless backend")
+    parser.add_argument("--refresh-rate", type = float, default = 60.0, help = "refresh rate for dropped frames")
+    parser.add_argument("--press-interval", type = float, default = 0.15, help = "mean s between repeated presses")
+    parser.add_argument("--response-time", type = float, default = 0.8, help = "mean s to answer a prompt")
+    parser.add_argument("--stray", type = float, default = 0.02, help = "probability that a press hits another key")
+    parser.add_argument("--lenient-decks", action = "store_true", help = "only warn about invalid CRCP deck tables")
+    parser.add_argument("--keep-data", action = "store_true", help = "keep the session files the runs write")
+    parser.add_argument("--output", help = "save the results as json")
+    parser.add_argument("--baseline", help = "json results of a previous run to compare with")
+    parser.add_argument("--tolerance", type = float, default = 0.2, help = "allowed slowdown over the baseline")
+    args = parser.parse_args()
+
+    unknown = [task for task in args.tasks if task not in TASK_SCRIPTS]
+    if unknown:
+        parser.error(f"unknown tasks: {', '.join(unknown)}")
+
+    results = {}
+    for task in args.tasks or sorted(TASK_SCRIPTS):
+        reports = [benchmark(task, args, args.seed + run) for run in range(args.repeat)]
+        results[task] = median_report(reports)
+        print_summary(task, results[task])
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        found = []
+        for task, summary in results.items():
+            if task in baseline:
+                found.extend(f"{task} {line}" for line in regressions(summary, baseline[task], args.tolerance))
+
+        if found:
+            print(f"Regressions over {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions over {args.baseline} (tolerance {args.tolerance:.0%})")
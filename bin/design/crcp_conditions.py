@@ -0,0 +1,64 @@
+# CRCP deck conditions
+# Python version of crcp_conditions.Rmd: generates the low, medium and high
+# risk deck tables in data/setup. No IDE needed; paths are relative to this
+# file.
+#
+# The committed tables were generated with rewards rounded to 0.1
+# (REWARD_ACCURACY); hd01_generate_deck.R rounds to 0.5.
+#
+# The --check run is automated in .github/workflows/deck-tables.yml for
+# every change to the design scripts or the tables.
+#
+# From the repository root:
+#     python bin/design/crcp_conditions.py           # write the tables
+#     python bin/design/crcp_conditions.py --check   # compare with the committed tables
+
+import argparse
+import os
+import sys
+
+DIR_ROOT    = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIR_DESIGN  = os.path.join(DIR_ROOT, "bin", "design")
+DIR_DATA    = os.path.join(DIR_ROOT, "data", "setup")
+
+sys.path.insert(0, DIR_DESIGN)
+
+from helpers.hd01_generate_deck import deck_csv, generate_deck
+
+REWARD_ACCURACY = 0.1
+
+# file, fixed EV, cards, draw whose rw_round is set to 0
+CONDITIONS = [("crcp_low_risk.csv",  1,    49, 37),
+              ("crcp_med_risk.csv",  2.18, 33, 25),
+              ("crcp_high_risk.csv", 8.05, 17, 17)]
+
+
+def condition_csv(fixed_ev, n_cards, zero_draw, accuracy = REWARD_ACCURACY):
+    """csv text of one condition's deck table."""
+    deck = generate_deck(fixed_ev, n_cards, accuracy)
+    deck["rw_round"][zero_draw - 1] = 0
+    return deck_csv(deck)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Generate the CRCP deck tables")
+    parser.add_argument("--check", action = "store_true", help = "compare with the committed tables instead of writing")
+    parser.add_argument("--out", default = DIR_DATA, help = "output directory")
+    args = parser.parse_args()
+
+    mismatches = 0
+    for file_name, fixed_ev, n_cards, zero_draw in CONDITIONS:
+        text = condition_csv(fixed_ev, n_cards, zero_draw)
+        path = os.path.join(args.out, file_name)
+
+        if args.check:
+            with open(path, newline = "") as deck_file:
+                same = deck_file.read() == text
+            mismatches += not same
+            print(f"{file_name}: {'identical' if same else 'DIFFERENT'}")
+        else:
+            with open(path, "w", newline = "") as deck_file:
+                deck_file.write(text)
+            print(f"{file_name}: written")
+
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,253 @@
+# CRCP deck design sweep
+# Generates every deck of a grid of fixed EVs, deck sizes and reward rounding
+# accuracies, works out the payouts of a set of stopping policies on each and
+# ranks the designs:
+# - flatness: how far the rounded EV of each draw (ev_rd) strays from the
+#   design's fixed EV, as a coefficient of variation over the draws
+#   before the last
+# - separation: for sets of one design per risk level, how distinct the
+#   payouts of a session (SESSION_DECKS decks of a level) are between
+#   neighbouring levels when played with the same policy, as the smallest
+#   d' (difference of the means over the pooled sd) across policies
+#
+# The policies are those of the task's engine (helpers/crcp_engine.py): stop
+# after a fixed fraction of the deck, or draw while the next draw's EV is
+# positive. Where a policy stops only depends on the deck's draw values, and
+# a deck stopped after s draws pays the pot of s good cards unless the bad
+# card came first, so the payouts follow exactly from the engine's bad-card
+# distribution (helpers/crcp_montecarlo.py) and no decks are simulated: one
+# deck pays its pot with probability p_survive, a session the pot times a
+# binomial count of surviving decks.
+#
+# Every deck size and rounding accuracy is a job for the process pool; the
+# decks of all EVs of a job are generated at once.
+#
+# Writes sweep_results.csv (every design), sweep_sets.csv (ranked sets of
+# risk levels) and the deck tables of the best set, in the data/setup format.
+#
+# From the repository root:
+#     python bin/design/crcp_sweep.py --ev 0.5:10:0.01 --cards 13:57 --accuracy 0.1 0.5 \
+#         --levels low=41:57 med=21:33 high=13:19 --out data/sweep
+
+import argparse
+import csv
+import importlib.util
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DIR_ROOT   = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DIR_DESIGN = os.path.join(DIR_ROOT, "bin", "design")
+DIR_TASK   = os.path.join(DIR_ROOT, "bin", "task")
+
+# The task's helpers package provides the engine; the deck generator lives in
+# bin/design/helpers, a folder of the same name, so it is imported by path
+sys.path.insert(0, DIR_TASK)
+
+from helpers.crcp_engine import Deck, EVThresholdPolicy, FixedStopPolicy
+from helpers.crcp_montecarlo import bad_card_pmf
+
+
+def import_design_helper(name):
+    """Module of bin/design/helpers, imported from its file."""
+    spec   = importlib.util.spec_from_file_location(name, os.path.join(DIR_DESIGN, "helpers", name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+hd01_generate_deck = import_design_helper("hd01_generate_deck")
+deck_csv           = hd01_generate_deck.deck_csv
+generate_decks     = hd01_generate_deck.generate_decks
+
+STOP_FRACTIONS = [0.25, 0.5, 0.75]  # fixed stopping rules, as fractions of the deck
+SESSION_DECKS  = 30                 # decks of each risk level in a session (N_TRIALS in CRCP.py)
+TOP_PER_LEVEL  = 10                 # flattest designs per level combined into sets
+
+
+def parse_range(spec, cast = float):
+    """Values of a start:stop[:step] range (stop included) or of a single value."""
+    parts = [cast(part) for part in spec.split(":")]
+    if len(parts) == 1:
+        return [parts[0]]
+    start, stop = parts[0], parts[1]
+    step = parts[2] if len(parts) > 2 else 1
+    count = int(round((stop - start) / step)) + 1
+    return [cast(round(start + i * step, 10)) for i in range(count)]
+
+
+class _GoodCards:
+    """Deck rng under which every card is good, to follow a policy's draws."""
+
+    def random(self):
+        return 1.0
+
+
+def engine_policies(n_cards):
+    """The engine's policies compared by the sweep, by name."""
+    policies = {f"stop{int(fraction * 100)}": FixedStopPolicy(max(1, int(round(fraction * n_cards))))
+                for fraction in STOP_FRACTIONS}
+    policies["ev"] = EVThresholdPolicy()
+    return policies
+
+
+def policy_stop(policy, draw_values, n_cards):
+    """Draws after which policy cashes out a deck, if the bad card does not come first."""
+    deck = Deck(draw_values, n_cards, _GoodCards())
+    while deck.n_draws < n_cards - 1 and policy(deck):
+        deck.draw()
+    return deck.n_draws
+
+
+def sweep_job(n_cards, accuracy, fixed_evs, session_decks = SESSION_DECKS):
+    """Generate and score the decks of every fixed EV for one deck size and accuracy."""
+    decks    = generate_decks(fixed_evs, n_cards, accuracy)
+    rw_round = decks["rw_round"].copy()
+    rw_round[:, -1] = 0  # the last card is always the bad one
+    ev_rd = decks["ev_rd"][:, :-1]
+
+    fixed   = np.asarray(fixed_evs)[:, np.newaxis]
+    ev_sd   = ev_rd.std(axis = 1)
+    valid   = np.all((rw_round[:, :-1] > 0) & np.isfinite(rw_round[:, :-1]), axis = 1)
+
+    # Pot after s good draws and the probability that a deck survives s draws
+    pots    = np.concatenate((np.zeros((len(fixed_evs), 1)), np.cumsum(rw_round[:, :-1], axis = 1)), axis = 1)
+    survive = np.clip(np.concatenate(([1.0], 1 - np.cumsum(bad_card_pmf(n_cards))))[:n_cards], 0, 1)
+
+    rows     = []
+    policies = engine_policies(n_cards)
+    for i, fixed_ev in enumerate(fixed_evs):
+        row = {"n_cards":    n_cards,
+               "fixed_ev":   fixed_ev,
+               "accuracy":   accuracy,
+               "valid":      bool(valid[i]),
+               "ev_rd_mean": float(ev_rd[i].mean()),
+               "ev_rd_sd":   float(ev_sd[i]),
+               "flatness":   float(ev_sd[i] / abs(fixed_ev)),
+               "max_dev":    float(np.max(np.abs(ev_rd[i] - fixed[i]))),
+               "max_pot":    float(pots[i, -1])}
+
+        # A session pays the pot times the number of surviving decks (binomial)
+        for name, policy in policies.items():
+            stop      = policy_stop(policy, rw_round[i], n_cards) if valid[i] else 0
+            p_survive = survive[stop]
+            row[f"{name}_draws"]        = stop
+            row[f"{name}_mean"]         = float(pots[i, stop] * p_survive)
+            row[f"{name}_sd"]           = float(pots[i, stop] * np.sqrt(p_survive * (1 - p_survive)))
+            row[f"{name}_p_lose"]       = float(1 - p_survive)
+            row[f"{name}_session_mean"] = float(session_decks * pots[i, stop] * p_survive)
+            row[f"{name}_session_sd"]   = float(pots[i, stop] * np.sqrt(session_decks * p_survive * (1 - p_survive)))
+        rows.append(row)
+
+    return rows
+
+
+def run_sweep(fixed_evs, deck_sizes, accuracies, workers = None, session_decks = SESSION_DECKS):
+    """Score every design of the grid across a process pool."""
+    jobs = list(itertools.product(deck_sizes, accuracies))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        futures = [pool.submit(sweep_job, n_cards, accuracy, fixed_evs, session_decks) for n_cards, accuracy in jobs]
+        for future in futures:
+            rows.extend(future.result())
+    return rows
+
+
+def session_separation(lower, higher):
+    """Smallest d' between the session payouts of two designs played with the same policy."""
+    d_primes = []
+    for name in [column[:-len("_session_mean")] for column in lower if column.endswith("_session_mean")]:
+        difference = abs(higher[f"{name}_session_mean"] - lower[f"{name}_session_mean"])
+        pooled_sd  = np.sqrt((lower[f"{name}_session_sd"] ** 2 + higher[f"{name}_session_sd"] ** 2) / 2)
+        d_primes.append(difference / pooled_sd if pooled_sd > 0 else (np.inf if difference > 0 else 0.0))
+    return float(min(d_primes))
+
+
+def rank_sets(rows, levels, top = TOP_PER_LEVEL):
+    """Ranked sets of one design per risk level (most separated, then flattest first).
+
+    levels maps a level name to the range of deck sizes it may use, ordered
+    from the lowest to the highest risk.
+    """
+    candidates = []
+    for sizes in levels.values():
+        level_rows = [row for row in rows if row["valid"] and row["n_cards"] in sizes]
+        candidates.append(sorted(level_rows, key = lambda row: row["flatness"])[:top])
+
+    sets = []
+    for designs in itertools.product(*candidates):
+        # Higher risk levels have smaller decks: a higher bad-card probability on every draw
+        sizes = [design["n_cards"] for design in designs]
+        if any(later >= earlier for earlier, later in zip(sizes, sizes[1:])):
+            continue
+        gap      = min(session_separation(lower, higher) for lower, higher in zip(designs, designs[1:])) if len(designs) > 1 else 0.0
+        flatness = max(design["flatness"] for design in designs)
+        sets.append((gap, flatness, designs))
+
+    sets.sort(key = lambda item: (-item[0], item[1]))
+    return sets
+
+
+def write_rows(rows, path):
+    with open(path, "w", newline = "") as out_file:
+        writer = csv.DictWriter(out_file, fieldnames = list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_candidate(design, path):
+    """Deck table of a design in the data/setup format, with the last draw zeroed."""
+    deck = {column: np.array(values[0])
+            for column, values in generate_decks([design["fixed_ev"]], design["n_cards"], design["accuracy"]).items()}
+    deck["rw_round"][-1] = 0
+    with open(path, "w", newline = "") as deck_file:
+        deck_file.write(deck_csv(deck))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Sweep CRCP deck designs and rank them")
+    parser.add_argument("--ev", default = "0.5:10:0.05", help = "fixed EV range, start:stop:step")
+    parser.add_argument("--cards", default = "13:57", help = "deck size range, start:stop[:step]")
+    parser.add_argument("--accuracy", nargs = "+", type = float, default = [0.1, 0.5], help = "reward rounding accuracies")
+    parser.add_argument("--levels", nargs = "+", default = ["low=41:57", "med=21:33", "high=13:19"],
+                        help = "risk levels as name=start:stop deck sizes, lowest risk first")
+    parser.add_argument("--session-decks", type = int, default = SESSION_DECKS, help = "decks of each level per session")
+    parser.add_argument("--workers", type = int, default = None)
+    parser.add_argument("--top", type = int, default = 20, help = "sets to write to sweep_sets.csv")
+    parser.add_argument("--out", default = os.path.join(DIR_ROOT, "data", "sweep"))
+    args = parser.parse_args()
+
+    fixed_evs  = parse_range(args.ev)
+    deck_sizes = parse_range(args.cards, int)
+    levels     = {name: set(parse_range(sizes, int)) for name, _, sizes in (level.partition("=") for level in args.levels)}
+
+    rows = run_sweep(fixed_evs, deck_sizes, args.accuracy, args.workers, args.session_decks)
+    rows.sort(key = lambda row: (not row["valid"], row["flatness"]))
+
+    os.makedirs(args.out, exist_ok = True)
+    write_rows(rows, os.path.join(args.out, "sweep_results.csv"))
+
+    sets = rank_sets(rows, levels)
+    if not sets:
+        print(f"{len(rows)} designs scored, no valid set of risk levels")
+        raise SystemExit(1)
+
+    set_rows = []
+    for rank, (separation, flatness, designs) in enumerate(sets[:args.top], start = 1):
+        set_row = {"rank": rank, "separation": separation, "flatness": flatness}
+        for name, design in zip(levels, designs):
+            set_row.update({f"{name}_cards": design["n_cards"], f"{name}_ev": design["fixed_ev"],
+                            f"{name}_accuracy": design["accuracy"]})
+        set_rows.append(set_row)
+    write_rows(set_rows, os.path.join(args.out, "sweep_sets.csv"))
+
+    for name, design in zip(levels, sets[0][2]):
+        write_candidate(design, os.path.join(args.out, f"crcp_{name}_risk.csv"))
+
+    print(f"{len(rows)} designs scored, {len(sets)} sets ranked")
+    print("best set: " + ", ".join(f"{name} {design['n_cards']} cards, EV {design['fixed_ev']:g}, accuracy {design['accuracy']:g}"
+                                    for name, design in zip(levels, sets[0][2])))
@@ -0,0 +1,128 @@
+# Python port of hd01_generate_deck.R
+# Builds the CRCP deck tables: for a deck of n_cards with one bad card, the
+# reward of every draw is set so that the expected value of drawing stays at
+# fixed_ev given the points already in the pot.
+#
+# The reward of a draw depends on the pot left by the previous draws, so the
+# recursion runs draw by draw; it is vectorized across decks instead, and
+# generate_decks() builds the tables of many fixed_ev values with the same
+# number of cards in one pass. Every column is computed with the same
+# floating point operations, in the same order, as the R code, so the
+# tables (and their csv files) match the R output exactly.
+
+import math
+
+import numpy as np
+
+COLUMNS = ["draw", "cards_left", "p_lose", "p_win", "bank_value", "reward", "ev_win", "ev_lose",
+           "ev_draw", "rw_round", "bn_rd", "ev_win_rd", "ev_lose_rd", "ev_rd"]
+
+INTEGER_COLUMNS = ["draw", "cards_left"]
+
+
+def round_any(values, accuracy):
+    """plyr::round_any(): round to the nearest multiple of accuracy (halves to even, as R)."""
+    return np.round(values / accuracy) * accuracy
+
+
+def cumsum_extended(values):
+    """Cumulative sums along axis 1 as R's cumsum() computes them.
+
+    R accumulates in extended precision and rounds each partial sum to a
+    double; a compensated (double-double) running sum gives the same partial
+    sums on every platform.
+    """
+    sums  = np.empty_like(values)
+    total = np.zeros(values.shape[0])
+    error = np.zeros(values.shape[0])
+    for i in range(values.shape[1]):
+        step  = total + values[:, i]
+        part  = step - total
+        error = error + ((total - (step - part)) + (values[:, i] - part))
+        total = step
+        sums[:, i] = np.where(np.isfinite(total), total + error, total)
+    return sums
+
+
+def generate_decks(fixed_evs, n_cards, accuracy = 0.5):
+    """Deck tables for every value of fixed_evs, for decks of n_cards.
+
+    Returns a dict of column -> array of shape (len(fixed_evs), n_cards);
+    draw, cards_left, p_lose and p_win are the same for every deck.
+    """
+    fixed_evs = np.asarray(fixed_evs, dtype = np.float64)[:, np.newaxis]
+    n_decks   = fixed_evs.shape[0]
+
+    draw       = np.arange(1, n_cards + 1)
+    cards_left = n_cards - (draw - 1)
+    p_lose     = 1 / cards_left
+    p_win      = 1 - p_lose
+
+    bank_value = np.zeros((n_decks, n_cards))
+    reward     = np.zeros((n_decks, n_cards))
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        reward[:, 0] = fixed_evs[:, 0] / p_win[0]
+        for i in range(1, n_cards):
+            bank_value[:, i] = bank_value[:, i - 1] + reward[:, i - 1]
+            reward[:, i]     = (fixed_evs[:, 0] + (bank_value[:, i] * p_lose[i])) / p_win[i]
+
+        ev_win   = p_win * reward
+        ev_lose  = p_lose * bank_value
+        ev_draw  = ev_win - ev_lose
+        rw_round = round_any(reward, accuracy)
+
+        bn_rd = np.zeros((n_decks, n_cards))
+        bn_rd[:, 1:] = cumsum_extended(rw_round)[:, :-1]
+
+        ev_win_rd  = rw_round * p_win
+        ev_lose_rd = bn_rd * p_lose
+        ev_rd      = ev_win_rd - ev_lose_rd
+
+    shape = (n_decks, n_cards)
+    return {"draw":       np.broadcast_to(draw, shape),
+            "cards_left": np.broadcast_to(cards_left, shape),
+            "p_lose":     np.broadcast_to(p_lose, shape),
+            "p_win":      np.broadcast_to(p_win, shape),
+            "bank_value": bank_value,
+            "reward":     reward,
+            "ev_win":     ev_win,
+            "ev_lose":    ev_lose,
+            "ev_draw":    ev_draw,
+            "rw_round":   rw_round,
+            "bn_rd":      bn_rd,
+            "ev_win_rd":  ev_win_rd,
+            "ev_lose_rd": ev_lose_rd,
+            "ev_rd":      ev_rd}
+
+
+def generate_deck(fixed_ev, n_cards, accuracy = 0.5):
+    """Deck table of one deck: a dict of column -> array of length n_cards."""
+    decks = generate_decks([fixed_ev], n_cards, accuracy)
+    return {column: np.array(values[0]) for column, values in decks.items()}
+
+
+def format_value(value):
+    """A number as readr::write_csv() writes it (shortest round-trip form, Inf and NA)."""
+    if math.isnan(value):
+        return "NA"
+    if math.isinf(value):
+        return "Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def deck_csv(deck):
+    """csv text of a deck table, formatted like readr::write_csv()."""
+    lines = [",".join(COLUMNS)]
+    for i in range(len(deck["draw"])):
+        lines.append(",".join(str(int(deck[column][i])) if column in INTEGER_COLUMNS
+                              else format_value(float(deck[column][i])) for column in COLUMNS))
+    return "\n".join(lines) + "\n"
+
+
+def write_deck(deck, path):
+    """Write a deck table as a csv file, formatted like readr::write_csv()."""
+    with open(path, "w", newline = "") as deck_file:
+        deck_file.write(deck_csv(deck))
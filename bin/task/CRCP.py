@@ -40,15 +40,13 @@
 
 # Final images are available along this task, we cannot distribute the original vector images as per license agreement.
 
-from doctest import FAIL_FAST
+# Only what the setup dialog needs is imported before it is shown, so it
+# appears right away; the other libraries are imported once it returns
+# (profile with bin/bench/import_profile.py)
 import random
-from psychopy import core, data, event, gui, visual
+from psychopy import core, gui
 import datetime
 import os
-import glob
-import math
-import pandas as pd
-import numpy as np
 
 # SETUP 
 ## Ensure that relative paths start from the same directory as this script
@@ -79,6 +77,25 @@ if(setup_dialog.OK):
 else:
     core.quit() # user pressed cancel
 
+# Task libraries
+import glob
+import numpy as np
+from psychopy import logging, visual
+
+from helpers.animation import Trajectory
+from helpers.crcp_engine import Deck
+from helpers.crcp_layout import (BANK_POS, BANK_SIZE, CARD_ORI, CARD_POS, CARD_SIZE, CHOICE_COLOR, CONTROL_SIZE,
+                                 COUNTER_SIZE, DECISION_OFFSET, DECISION_SIZE, DECK_HOFFSET, DECK_ORI, DECK_POS,
+                                 DECK_SIZE, DECK_VOFFSET, EARNINGS_COLOR, LOST_COLOR, MOV_STEPS, OUTCOME_SIZE,
+                                 SUMMARY_COLOR, SUMMARY_SIZE, TOKEN_POS, TOKEN_SIZE, WIN_COLOR, WIN_HEIGHT, WIN_WIDTH)
+from helpers.deck_tables import load_deck_tables
+from helpers.frame_timing import FrameTimer, routine
+from helpers.key_input import open_key_input
+from helpers.stim_atlas import stim_decoder
+from helpers.stim_cache import TextureCache
+from helpers.text_pool import TextPool
+from helpers.trial_logger import TrialLogger
+
 # Define behavior for practice and normal runs
 if test_run == True:
     N_TRIALS  = 2  #number of decks of each type
@@ -88,18 +105,23 @@ elif test_run == False:
     N_TRIALS = 30
 
 # Define and initialize csv file to dump data
-CRCP_FILE = os.path.join(DIR_DATA, "%s-%s-%s" % ("crcp", exp_info["participant_id"], exp_info["date_time"]) + ".csv")
-crcp_log = open(CRCP_FILE, "w")
-crcp_log.write("id, deck_number, deck_id, risk, color, card, draw_value, pot, draw, choice, failed, start, end\n")
+# Rows are buffered and written in the background every LOG_FLUSH_INTERVAL seconds,
+# and synced to disk on break screens and at the end of the task
+# TYPED_FORMAT ("parquet", "arrow" or None) also writes a typed session file at the end
+# start is the flip that showed the decision screen, key_time the key press (both on clock)
+# and rt the time between them (99 when there was no response)
+# hazard is the engine's bad-card hazard model (helpers/crcp_engine.py)
+LOG_FLUSH_INTERVAL = 5
+TYPED_FORMAT       = None
+LOG_COLUMNS        = ["id", "deck_number", "deck_id", "risk", "color", "card", "draw_value",
+                      "pot", "draw", "choice", "failed", "start", "end", "key_time", "rt", "hazard"]
 
-# Window and stimulus sizes
-WIN_WIDTH = 1920
-WIN_HEIGHT = 1080
+CRCP_FILE = os.path.join(DIR_DATA, "%s-%s-%s" % ("crcp", exp_info["participant_id"], exp_info["date_time"]) + ".csv")
+crcp_log  = TrialLogger(CRCP_FILE, LOG_COLUMNS, flush_interval = LOG_FLUSH_INTERVAL,
+                        task = "crcp", typed_format = TYPED_FORMAT)
 
-CARD_SIZE  = (250, 357)
-DECK_SIZE  = (250, 357)
-TOKEN_SIZE = (242.5, 300)
-BANK_SIZE  = (270, 275)
+# Session log for run-level information (stimulus loading, timing summaries)
+session_log = logging.LogFile(CRCP_FILE.replace(".csv", ".log"), level = logging.DATA, filemode = "w")
 
 # Image paths
 DECK_LIST  = glob.glob(os.path.join(DIR_STIM, "deck*.png"))
@@ -110,6 +132,19 @@ TOKEN_LIST = glob.glob(os.path.join(DIR_STIM, "tokens*.png"))
 BAD_CARD_IMAGE = os.path.join(DIR_STIM, "nuke.png")
 BANK_IMAGE     = os.path.join(DIR_STIM, "bank.png")
 
+# Stimulus loading: "atlas" reads the prebuilt atlases in figures/atlas,
+# "files" decodes the original PNGs
+STIM_SOURCE       = "atlas"
+TEXTURE_BUDGET_MB = 128
+
+# Number of upcoming card images decoded in the background while
+# the participant is on the decision screen
+PREFETCH_DEPTH = 3
+
+# Record every window flip and write a frame-timing file next to the session data
+FRAME_TIMING = False
+FRAME_FILE   = CRCP_FILE.replace(".csv", "-frames.csv")
+
 # Randomly assign deck colors to risk levels
 color_index = [0, 1, 2]
 random.shuffle(color_index)
@@ -117,31 +152,18 @@ shuffled_decks  = list(map(DECK_LIST.__getitem__, color_index))
 shuffled_tokens = list(map(TOKEN_LIST.__getitem__, color_index))
 shuffled_backs  = list(map(BACK_LIST.__getitem__, color_index))
 
-# Text settings
-DECISION_SIZE   = 45
-DECISION_OFFSET = DECK_SIZE[1]/1.2
-
-OUTCOME_SIZE = 50
-CONTROL_SIZE = 35
-COUNTER_SIZE = 50
-SUMMARY_SIZE = 60
-CHOICE_SIZE  = 60
-
-SUMMARY_COLOR  = "#93FAEE"
-LOST_COLOR     = "#FFA6A3"
-EARNINGS_COLOR = "#ABFF94"
-CHOICE_COLOR   = "#F7E759"
-
 # Animation settings
-DECK_HOFFSET = -400
-DECK_VOFFSET = 0
-
-START_ANGLE = -90
-FINAL_ANGLE = 0
-ANGLE_INC   = 4
-
-MOV_STEPS = len(range(START_ANGLE, FINAL_ANGLE, ANGLE_INC))
-POS_INC   = 17.5
+# Window, stimulus and text settings are in helpers/crcp_layout.py, shared
+# with the session replay
+# The card back moves from the deck to where the card is revealed in
+# FLIP_DURATION seconds (the length of the original MOV_STEPS frames at 60 Hz),
+# whatever the refresh rate
+FLIP_DURATION   = MOV_STEPS / 60
+CARD_TRAJECTORY = Trajectory(
+    start_pose = (DECK_ORI, DECK_HOFFSET, DECK_VOFFSET + 10),
+    end_pose   = (CARD_ORI, CARD_POS[0], CARD_POS[1]),
+    duration   = FLIP_DURATION
+)
 
 # Task settings
 MAX_DRAWS   = [49, 25, 17]  # three risk types
@@ -151,26 +173,42 @@ BREAKS      = range(19, 89, 20)
 # Define stimulus sequences and deck settings
 DECK_SEQUENCE = np.repeat(range(0, len(MAX_DRAWS)), N_TRIALS)
 
-LOW_DECK  = pd.read_csv(os.path.join(DIR_SEQ, "crcp_low_risk.csv"))
-MED_DECK  = pd.read_csv(os.path.join(DIR_SEQ, "crcp_med_risk.csv"))
-HIGH_DECK = pd.read_csv(os.path.join(DIR_SEQ, "crcp_high_risk.csv"))
+# Draw values of each risk level, in the order of MAX_DRAWS
+# DECK_VALIDATION = "warn" prints the problems of tables that do not match their
+# deck size, "strict" stops the task before the window opens. The committed low
+# and medium risk tables have known problems (a zero draw value at draw 37, a
+# table generated for 33 cards), kept as designed, so the task warns
+DECK_VALIDATION = "warn"
+DECK_TABLES     = [os.path.join(DIR_SEQ, "crcp_low_risk.csv"),
+                   os.path.join(DIR_SEQ, "crcp_med_risk.csv"),
+                   os.path.join(DIR_SEQ, "crcp_high_risk.csv")]
 
-DECK_INFO = [LOW_DECK, MED_DECK, HIGH_DECK]
+DECK_INFO = load_deck_tables(DECK_TABLES, MAX_DRAWS, strict = DECK_VALIDATION == "strict")
 
 # Define response keys
 KEY_DRAW    = "space"
 KEY_CASHOUT = "return"
 KEY_QUIT    = "escape"
 
+# Keyboard backend: "ptb" (psychtoolbox key queue, hardware timestamps),
+# "event" (window event loop, frame accuracy) or "fake" (simulated presses)
+KEY_BACKEND = "ptb"
+
 # Define objects to draw
 # Window
 win = visual.Window(
     size    = (WIN_WIDTH, WIN_HEIGHT),
     units   = "pix",
-    color   = "#666666",
+    color   = WIN_COLOR,
     fullscr = False
 )
 
+if FRAME_TIMING:
+    frame_timer = FrameTimer(win)
+
+# Keyboard, timestamping presses on the task clock
+keyboard = open_key_input(KEY_BACKEND, clock)
+
 # Text objects
 decision_text = visual.TextStim(
     win,
@@ -217,83 +255,107 @@ card_counter = visual.TextStim(
     anchorVert  = "bottom"
 )
 
-# Image objects
-total_bank = visual.ImageStim(
-    win   = win,
-    image = BANK_IMAGE,
-    size  = BANK_SIZE,
-    pos   = [0, -10]
-)
+# Text fields redrawn on every decision, card and summary screen get their own
+# stims, laid out only when their text changes
+text_pool = TextPool(win)
 
-card_back = visual.ImageStim(
-    win  = win,
-    size = DECK_SIZE
+# Image objects
+# Images are decoded once at display resolution and drawn from the cache,
+# so revealing a card binds an existing texture instead of decoding a PNG.
+# The images of every deck and screen are decoded up front; the card fronts
+# are only registered and decoded in the background (prefetch) while the
+# participant decides, so the task starts without decoding the whole stock
+textures = TextureCache(win, budget_mb = TEXTURE_BUDGET_MB, decode = stim_decoder(STIM_SOURCE))
+
+textures.register(
+    CARD_LIST,
+    size = CARD_SIZE,
+    pos  = CARD_POS,
+    ori  = CARD_ORI
 )
 
-card_front = visual.ImageStim(
-    win  = win,
+textures.preload(
+    [BAD_CARD_IMAGE],
     size = CARD_SIZE,
-    pos  = [DECK_HOFFSET + (MOV_STEPS * POS_INC), DECK_VOFFSET + 10],
-    ori  = math.radians(FINAL_ANGLE)
+    pos  = CARD_POS,
+    ori  = CARD_ORI
 )
 
-deck_stack = visual.ImageStim(
-    win  = win,
+textures.preload(
+    DECK_LIST,
     size = DECK_SIZE,
-    pos  = [DECK_HOFFSET, DECK_VOFFSET],
-    ori  = math.radians(START_ANGLE)
+    pos  = DECK_POS,
+    ori  = DECK_ORI
 )
 
-token_stack = visual.ImageStim(
-    win  = win,
+textures.preload(
+    BACK_LIST,
+    size = DECK_SIZE
+)
+
+textures.preload(
+    TOKEN_LIST,
     size = TOKEN_SIZE,
-    pos  = [-DECK_HOFFSET, DECK_VOFFSET-30]
+    pos  = TOKEN_POS
+)
+
+textures.preload(
+    [BANK_IMAGE],
+    size = BANK_SIZE,
+    pos  = BANK_POS
 )
 
 # Animation
 # Drawing a card each turn
+@routine("draw_card")
 def draw_card(front_image, deck, draw_value):
     # move the back of the card from left to right
-    step = 0
-    card_front.image  = front_image
-    deck_stack.image  = shuffled_decks[deck]
-    card_back.image   = shuffled_backs[deck]
-    token_stack.image = shuffled_tokens[deck]
-
-    for angle in range(START_ANGLE, FINAL_ANGLE, ANGLE_INC):
+    card_front  = textures.get(front_image)
+    deck_stack  = textures.get(shuffled_decks[deck])
+    card_back   = textures.get(shuffled_backs[deck])
+    token_stack = textures.get(shuffled_tokens[deck])
+
+    # the pose of each frame depends on the time since the animation started
+    start   = core.getTime()
+    elapsed = 0
+    while not CARD_TRAJECTORY.finished(elapsed):
+        ori, x, y = CARD_TRAJECTORY.pose(elapsed)
         deck_stack.draw()
         token_stack.draw()
-        card_back.ori = math.radians(angle)
-        card_back.pos = [DECK_HOFFSET + step, DECK_VOFFSET + 10]
+        card_back.ori = ori
+        card_back.pos = [x, y]
         card_back.draw()
         win.flip()
-        step += POS_INC
-        if angle == max(range(START_ANGLE, FINAL_ANGLE, ANGLE_INC)):
-            deck_stack.draw()
-            token_stack.draw()
-            card_front.draw()
-            wait_time = random.uniform(0.5, 0.6)
-            if draw_value == 0:
-                drawText(counter_text, (0, DECISION_OFFSET), "YOU LOST THE POT!", "center", True)
-            else:
-                drawText(counter_text, (0, DECISION_OFFSET), "Pot increased by", "center", True)
-                drawText(counter_text, (0, DECISION_OFFSET-50), "{:.2f}".format(draw_value), "center", True, CHOICE_COLOR)
-                
-            win.flip()
-            core.wait(wait_time)
-           
+        elapsed = core.getTime() - start
+
+    # reveal the card
+    deck_stack.draw()
+    token_stack.draw()
+    card_front.draw()
+    wait_time = random.uniform(0.5, 0.6)
+    if draw_value == 0:
+        text_pool.draw(counter_text, (0, DECISION_OFFSET), "YOU LOST THE POT!", "center", True, screen = "lost")
+    else:
+        text_pool.draw(counter_text, (0, DECISION_OFFSET), "Pot increased by", "center", True, screen = "card")
+        text_pool.draw(counter_text, (0, DECISION_OFFSET-50), "{:.2f}".format(draw_value), "center", True, CHOICE_COLOR,
+                       screen = "card")
+        
+    win.flip()
+    core.wait(wait_time)
+
 # Summary screen
+@routine("bank_summary", animated = False)
 def bank_summary(earnings, total, lost = False):
     if lost == False:
         temp_bank_color = SUMMARY_COLOR
     else:
         temp_bank_color = LOST_COLOR
 
-    total_bank.draw()
-    drawText(summary_text, (DECK_HOFFSET + 150, 250), "Collected:", "center", True)
-    drawText(summary_text, (DECK_HOFFSET + 150, 180), "{:.2f}".format(earnings), "center", True, temp_bank_color)
-    drawText(summary_text, (-DECK_HOFFSET - 150, 250), "Total:", "center", True)
-    drawText(summary_text, (-DECK_HOFFSET - 150, 180), "{:.2f}".format(total), "center", True, EARNINGS_COLOR)
+    textures.get(BANK_IMAGE).draw()
+    text_pool.draw(summary_text, (DECK_HOFFSET + 150, 250), "Collected:", "center", True)
+    text_pool.draw(summary_text, (DECK_HOFFSET + 150, 180), "{:.2f}".format(earnings), "center", True, temp_bank_color)
+    text_pool.draw(summary_text, (-DECK_HOFFSET - 150, 250), "Total:", "center", True)
+    text_pool.draw(summary_text, (-DECK_HOFFSET - 150, 180), "{:.2f}".format(total), "center", True, EARNINGS_COLOR)
     
 
 def drawText(TextStim, pos, txt, alignment="right", bold = False, color = "white"):
@@ -306,27 +368,45 @@ def drawText(TextStim, pos, txt, alignment="right", bold = False, color = "white
     TextStim.wrapWidth=1000 
     TextStim.draw()
 
+@routine("decisionStage", animated = False)
 def decisionStage(deck_image, tokens_image, tempPoints, currentValue, cards_left):
-    """Displays decision scenario with the value of taking action and points accrued in the deck"""
-    deck_stack.setImage(deck_image)
-    token_stack.setImage(tokens_image)
+    """Displays decision scenario with the value of taking action and points accrued in the deck.
+
+    Returns the time of the flip that showed it, on the task clock."""
+    deck_stack  = textures.get(deck_image)
+    token_stack = textures.get(tokens_image)
     deck_stack.draw()
     token_stack.draw()    
     
-    drawText(counter_text, (0, DECISION_OFFSET), "Cards left:", "center", True)
-    drawText(counter_text, (0, DECISION_OFFSET-50), "{:d}".format(cards_left), "center", True, CHOICE_COLOR)
+    text_pool.draw(counter_text, (0, DECISION_OFFSET), "Cards left:", "center", True)
+    text_pool.draw(counter_text, (0, DECISION_OFFSET-50), "{:d}".format(cards_left), "center", True, CHOICE_COLOR)
 
-    drawText(decision_text, (DECK_HOFFSET, -220), "Draw value:", "center", True)
-    drawText(decision_text, (DECK_HOFFSET, -270), "{:.2f}".format(currentValue), "center", True, CHOICE_COLOR)
-    drawText(control_text, (DECK_HOFFSET, -370), "Press SPACE\nto draw a card", "center")
+    text_pool.draw(decision_text, (DECK_HOFFSET, -220), "Draw value:", "center", True)
+    text_pool.draw(decision_text, (DECK_HOFFSET, -270), "{:.2f}".format(currentValue), "center", True, CHOICE_COLOR)
+    text_pool.draw(control_text, (DECK_HOFFSET, -370), "Press SPACE\nto draw a card", "center")
 
-    drawText(decision_text, (-DECK_HOFFSET, -220), "Pot value:", "center", True)
-    drawText(decision_text, (-DECK_HOFFSET, -270), "{:.2f}".format(tempPoints), "center", True, CHOICE_COLOR)
-    drawText(control_text, (-DECK_HOFFSET, -370), "Press ENTER\nto collect pot", "center")
+    text_pool.draw(decision_text, (-DECK_HOFFSET, -220), "Pot value:", "center", True)
+    text_pool.draw(decision_text, (-DECK_HOFFSET, -270), "{:.2f}".format(tempPoints), "center", True, CHOICE_COLOR)
+    text_pool.draw(control_text, (-DECK_HOFFSET, -370), "Press ENTER\nto collect pot", "center")
         
     win.flip()
+    flip_time = clock.getTime()
     deck_stack.setAutoDraw(False)
+    return flip_time
+
+def log_session_stats():
+    """Write texture cache, prefetch and frame-timing summaries to the session log."""
+    textures.close()
+    stats = textures.stats()
+    logging.data("Texture requests: {hits} cached, {prefetched} prefetch hits, {misses} misses".format(**stats))
+
+    if FRAME_TIMING:
+        for row in frame_timer.save(FRAME_FILE):
+            logging.data("Frame times [{routine}]: {frames} frames, p50 {p50_ms} ms, "
+                         "p95 {p95_ms} ms, p99 {p99_ms} ms, {cpu_ms} ms CPU, {dropped} dropped".format(**row))
+    logging.flush()
 
+@routine("crcp", animated = False)
 def crcp():
     """Execute experiment"""
     random.shuffle(DECK_SEQUENCE)
@@ -335,12 +415,8 @@ def crcp():
     for iTrial, trial in enumerate(DECK_SEQUENCE):
         
         # Reset counters
-        n_draws = 0 
-        temporal_pot = 0  
-        nuke = False #bad card drawn ends the trial
-        
-        continue_drawing = True #while trigger, when false trial ends
-        card_displayed   = "none"
+        card_displayed = "none"
+
         # Deck starting settings
         deck_image  = shuffled_decks[trial]
         token_image = shuffled_tokens[trial] #temporal pot image
@@ -349,6 +425,9 @@ def crcp():
         deck_color  = os.path.basename(deck_image).split(".")[0].split("_")[2]
         deck_id     = trial
 
+        # Game state (draws, pot, bad card) is handled by the engine
+        deck = Deck(deck_data, deck_risk)
+
         # Obtain a list of good card images to show
         # We have a finite number, so if the deck asks for more than the total
         # number of card images in stock, we sample with replacement
@@ -356,19 +435,29 @@ def crcp():
             card_sequence = random.sample(CARD_LIST, deck_risk)
         else:
             card_sequence = random.choices(CARD_LIST, k=deck_risk)
-        
-        # Draw cards from the deck
-        while continue_drawing and not nuke:
-            cards_left = deck_risk - n_draws
-            draw_value = deck_data.rw_round[n_draws] 
+
+        # Draw cards from the deck until cashing out, timing out or drawing the bad card
+        while not deck.finished:
+            n_draws      = deck.n_draws
+            temporal_pot = deck.pot
+            cards_left   = deck.cards_left
+            draw_value   = deck.draw_value
             
             # Display deck and temporal pot
-            decisionStage(deck_image, token_image, temporal_pot, draw_value, cards_left)
-        
-            trial_start_time = clock.getTime() #start time
+            # Trials start at the flip that shows the decision screen, and the response
+            # is timestamped on the same clock; only presses made after that flip count
+            keyboard.clear()
+            trial_start_time = decisionStage(deck_image, token_image, temporal_pot, draw_value, cards_left)
             
+            # Decode the upcoming cards while the participant decides
+            textures.prefetch(card_sequence[n_draws:n_draws + PREFETCH_DEPTH])
+
             # Wait for response
-            respond = event.waitKeys(keyList=[KEY_DRAW, KEY_CASHOUT, KEY_QUIT], maxWait = 5)
+            respond = keyboard.wait_keys([KEY_DRAW, KEY_CASHOUT, KEY_QUIT], max_wait = 5, clear = False)
+
+            if respond:
+                key_pressed, key_time = respond[0]
+                response_time = key_time - trial_start_time
 
             # No response - continue to next deck
             if not respond:
@@ -376,8 +465,8 @@ def crcp():
                 drawText(summary_text, (0, -50), "You LOST the pot", "center", True, LOST_COLOR)
                 win.flip()
                 core.wait(1.2)
-                temporal_pot = 0
-                permanent_bank += temporal_pot
+                deck.time_out()
+                temporal_pot = deck.pot
                 bank_summary(temporal_pot, permanent_bank, lost = True)
                 
                 # Database fillers for invalid/empty responses
@@ -385,62 +474,64 @@ def crcp():
                 choice_code     = 99
                 card_displayed  = "none"
                 trial_stop_time = 0
+                key_time        = 0
+                response_time   = 99
                 
                 if iTrial in BREAKS: # Break every certain amount of trials
                     drawText(summary_text, (0, -220), "You can take a break now", "center")
                     drawText(summary_text, (0, -350), "Press ENTER\nto continue", "center")
                     win.flip()
-                    event.waitKeys(keyList=KEY_CASHOUT)
+                    crcp_log.sync()
+                    keyboard.wait_keys([KEY_CASHOUT])
                 
                 else:
                     win.flip()
                     core.wait(DECK_ISI)
                     
-                continue_drawing = False
-            elif respond[0] == KEY_QUIT:
+            elif key_pressed == KEY_QUIT:
+                crcp_log.close()
+                log_session_stats()
                 return
 
             # Cash-out key pressed
-            elif respond[0] == KEY_CASHOUT:
+            elif key_pressed == KEY_CASHOUT:
                 choice_code = 0
                 bad_card_drawn = False
-                permanent_bank += temporal_pot
+                permanent_bank += deck.cash_out()
                 bank_summary(temporal_pot, permanent_bank, lost = False)
                 
                 if iTrial in BREAKS:
                     drawText(summary_text, (0, -220), "You can take a break now", "center")
                     drawText(summary_text, (0, -350), "Press ENTER\nto continue", "center")
                     win.flip()
-                    event.waitKeys(keyList=KEY_CASHOUT)
+                    crcp_log.sync()
+                    keyboard.wait_keys([KEY_CASHOUT])
                 
                 else:
                     win.flip()
                     core.wait(DECK_ISI)
-                continue_drawing = False
                 trial_stop_time = clock.getTime() #stop time
             
             # Draw key pressed
-            elif respond[0] == KEY_DRAW:
+            elif key_pressed == KEY_DRAW:
                 choice_code = 1
-                n_draws += 1
                 trial_stop_time = clock.getTime() #stop time
-                bad_card_drawn = random.random() < 1.0 / (deck_risk - n_draws)
+                bad_card_drawn, draw_value = deck.draw()
+                n_draws      = deck.n_draws
+                temporal_pot = deck.pot
                 
                 # determine whether bad card is drawn or not
                 if bad_card_drawn == True:
                     card_displayed = "bad"
-                    temporal_pot = 0
-                    permanent_bank += temporal_pot
-                    draw_value = 0
                     draw_card(BAD_CARD_IMAGE, trial, draw_value)
-                    nuke = True
                     bank_summary(temporal_pot, permanent_bank, lost = True)
                     
                     if iTrial in BREAKS:
                         drawText(summary_text, (0, -220), "You can take a break now", "center")
                         drawText(summary_text, (0, -350), "Press ENTER\nto continue", "center")
                         win.flip()
-                        event.waitKeys(keyList=KEY_CASHOUT)
+                        crcp_log.sync()
+                        keyboard.wait_keys([KEY_CASHOUT])
                     
                     else:
                         win.flip()
@@ -449,26 +540,24 @@ def crcp():
                     card_image = card_sequence[n_draws-1]
                     card_displayed = os.path.basename(card_image).split(".")[0].split("_")[1]
                     draw_card(card_image, trial, draw_value)
-                    temporal_pot += draw_value
-            
-            # Organize data log and write into file
-            temp_data = [str(exp_info["participant_id"]),
-                         str(iTrial),
-                         str(deck_id), 
-                         str(deck_risk),
-                         str(deck_color),
-                         str(card_displayed),
-                         str(draw_value),
-                         str(temporal_pot),
-                         str(n_draws),
-                         str(choice_code),
-                         str(bad_card_drawn),
-                         str(trial_start_time),
-                         str(trial_stop_time)]
             
-            temp_data = ",".join(temp_data)
-            temp_data = temp_data + "\n"
-            crcp_log.write(temp_data)
+            # Organize data log and queue it for writing
+            crcp_log.log(id          = exp_info["participant_id"],
+                         deck_number = iTrial,
+                         deck_id     = deck_id,
+                         risk        = deck_risk,
+                         color       = deck_color,
+                         card        = card_displayed,
+                         draw_value  = draw_value,
+                         pot         = temporal_pot,
+                         draw        = n_draws,
+                         choice      = choice_code,
+                         failed      = bad_card_drawn,
+                         start       = trial_start_time,
+                         end         = trial_stop_time,
+                         key_time    = key_time,
+                         rt          = response_time,
+                         hazard      = deck.hazard)
         
     # Final message and earnings summary
     if test_run == True:
@@ -481,6 +570,7 @@ def crcp():
         drawText(summary_text, (0, -100), "Thank you for your participation!", "center", True)
 
     crcp_log.close()
+    log_session_stats()
     win.flip()
     core.wait(4)
     return
@@ -0,0 +1 @@
+# Shared components for the AIDM PsychoPy tasks (CRCP and PSAP).
@@ -0,0 +1,34 @@
+# Time-keyed animations
+# An animation is a table of poses (orientation, x, y) sampled at a fixed
+# time step, built once at startup. Each frame looks up the pose for the time
+# elapsed since the animation started, so its duration does not depend on the
+# refresh rate and a dropped frame skips ahead instead of slowing it down.
+
+import numpy as np
+
+TABLE_STEP = 0.001  # time between rows of a trajectory table (s)
+
+
+class Trajectory:
+    """Linear movement from start_pose to end_pose over duration seconds.
+
+    Poses are (ori, x, y) tuples in the units of the animated stim.
+    """
+
+    def __init__(self, start_pose, end_pose, duration, step = TABLE_STEP):
+        self.duration = duration
+        self.step     = step
+
+        n_points   = int(round(duration / step)) + 1
+        fraction   = np.linspace(0, 1, n_points)[:, np.newaxis]
+        start, end = np.asarray(start_pose, dtype = float), np.asarray(end_pose, dtype = float)
+        self.table = start + fraction * (end - start)
+        self._rows = [tuple(row) for row in self.table.tolist()]
+
+    def pose(self, elapsed):
+        """(ori, x, y) at elapsed seconds; the last pose once the animation is over."""
+        index = min(int(elapsed / self.step), len(self._rows) - 1)
+        return self._rows[index]
+
+    def finished(self, elapsed):
+        return elapsed >= self.duration
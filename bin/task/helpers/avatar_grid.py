@@ -0,0 +1,42 @@
+# Avatar grid
+# A grid of clickable images (the PSAP avatar picker). Every avatar gets its
+# own ImageStim, created once with its image already decoded, and clicks are
+# hit-tested against rectangles computed when the grid is built, so a frame
+# of the picker only draws the stims and reads the mouse.
+
+
+class AvatarGrid:
+    """Independent image stims at fixed positions with precomputed hit rectangles.
+
+    images are decoded images (anything ImageStim accepts), in the same order
+    as positions; positions and size are in the window's units.
+    """
+
+    def __init__(self, win, images, positions, size):
+        from psychopy import visual
+
+        self.images = list(images)
+        self.stims  = [visual.ImageStim(win = win, image = image, pos = pos, size = size)
+                       for image, pos in zip(self.images, positions)]
+
+        half_width, half_height = size[0] / 2, size[1] / 2
+        self.rects = [(x - half_width, y - half_height, x + half_width, y + half_height)
+                      for x, y in positions]
+
+    def draw(self):
+        for stim in self.stims:
+            stim.draw()
+
+    def hit(self, pos):
+        """Index of the avatar at pos, or None."""
+        x, y = pos
+        for index, (left, bottom, right, top) in enumerate(self.rects):
+            if left <= x <= right and bottom <= y <= top:
+                return index
+        return None
+
+    def clicked(self, mouse, button = 0):
+        """Index of the avatar under the mouse while button is pressed, or None."""
+        if not mouse.getPressed()[button]:
+            return None
+        return self.hit(mouse.getPos())
@@ -0,0 +1,193 @@
+# CRCP game logic
+# The deck rules of the Cumulative Risk Card Paradigm without any drawing:
+# bad-card probability, pot accumulation from the deck's draw values and
+# cash-out. CRCP.py plays decks through this engine, and the same engine runs
+# headless with simulated participants (policies) to check deck designs.
+#
+# Simulate from the command line (from the repository root):
+#     python bin/task/helpers/crcp_engine.py data/setup/crcp_high_risk.csv 17 --policy ev --decks 100000
+
+import argparse
+import csv
+import random
+
+# Bad-card hazard models. CRCP logs the model of every deck (hazard column),
+# so sessions run with different models can be told apart:
+# - "baseline": one over the cards left after the draw, the hazard the task
+#   has always run; the draw before the last card is the bad card for sure
+# - "design": one over the cards left before the draw, the p_lose column of
+#   the deck tables; the last card of the deck is the bad card for sure.
+#   Only used when asked for (hazard argument, --hazard)
+HAZARD_MODELS = ("baseline", "design")
+HAZARD_MODEL  = "baseline"
+
+
+def last_draw(deck_size, model = HAZARD_MODEL):
+    """Draw at which the bad card shows up for sure."""
+    if model not in HAZARD_MODELS:
+        raise ValueError(f"Unknown hazard model {model!r}, use one of {', '.join(HAZARD_MODELS)}")
+    return deck_size if model == "design" else deck_size - 1
+
+
+def bad_card_probability(deck_size, n_draws, model = HAZARD_MODEL):
+    """Probability that the n_draws-th card drawn from the deck is the bad card."""
+    final_draw = last_draw(deck_size, model)
+    if not 1 <= n_draws <= final_draw:
+        raise ValueError(f"draw {n_draws} is outside a deck of {deck_size} cards")
+    return 1.0 / (final_draw - n_draws + 1)
+
+
+class Deck:
+    """State of one deck (trial): cards drawn, pot and outcome.
+
+    draw_values holds the value of each draw (the rw_round column of the deck
+    tables, one per card); rng is anything with a random() method; hazard is
+    the bad-card hazard model.
+    """
+
+    def __init__(self, draw_values, deck_size, rng = random, hazard = HAZARD_MODEL):
+        self.draw_values = draw_values
+        self.deck_size   = deck_size
+        self.rng         = rng
+        self.hazard      = hazard
+
+        self.n_draws    = 0
+        self.pot        = 0
+        self.lost       = False
+        self.cashed_out = False
+
+    @property
+    def cards_left(self):
+        return self.deck_size - self.n_draws
+
+    @property
+    def draw_value(self):
+        """Points added to the pot if the next card is good."""
+        return self.draw_values[self.n_draws]
+
+    @property
+    def p_lose(self):
+        """Probability that the next card is the bad card."""
+        return bad_card_probability(self.deck_size, self.n_draws + 1, self.hazard)
+
+    @property
+    def finished(self):
+        return self.lost or self.cashed_out
+
+    def draw(self):
+        """Draw a card. Returns (bad_card_drawn, points added to the pot)."""
+        value = self.draw_value
+        self.n_draws += 1
+
+        if self.rng.random() < bad_card_probability(self.deck_size, self.n_draws, self.hazard):
+            self.lost = True
+            self.pot  = 0
+            return True, 0
+
+        self.pot += value
+        return False, value
+
+    def cash_out(self):
+        """Stop drawing and return the pot."""
+        self.cashed_out = True
+        return self.pot
+
+    def time_out(self):
+        """No response in time: the pot is lost."""
+        self.lost = True
+        self.pot  = 0
+
+
+# Policies decide, for a deck in its current state, whether to draw (True)
+# or cash out (False)
+class FixedStopPolicy:
+    """Draw until a fixed number of cards has been drawn."""
+
+    def __init__(self, n_draws):
+        self.n_draws = n_draws
+
+    def __call__(self, deck):
+        return deck.n_draws < self.n_draws
+
+
+class EVThresholdPolicy:
+    """Draw while the expected value of the next draw is above a threshold."""
+
+    def __init__(self, threshold = 0):
+        self.threshold = threshold
+
+    def __call__(self, deck):
+        p_lose = deck.p_lose
+        ev     = (1 - p_lose) * deck.draw_value - p_lose * deck.pot
+        return ev > self.threshold
+
+
+class RandomPolicy:
+    """Draw with a fixed probability at every decision."""
+
+    def __init__(self, p_draw = 0.5, rng = random):
+        self.p_draw = p_draw
+        self.rng    = rng
+
+    def __call__(self, deck):
+        return self.rng.random() < self.p_draw
+
+
+def play_deck(deck, policy):
+    """Play a deck to the end with policy. Returns (n_draws, payout, lost)."""
+    while not deck.finished:
+        if policy(deck):
+            deck.draw()
+        else:
+            deck.cash_out()
+    return deck.n_draws, deck.pot, deck.lost
+
+
+def simulate_decks(draw_values, deck_size, policy, n_decks, rng = None, hazard = HAZARD_MODEL):
+    """Play n_decks identical decks with policy. Returns lists of draws, payouts and losses."""
+    rng = rng or random.Random()
+    draws, payouts, losses = [], [], []
+    for _ in range(n_decks):
+        n_draws, payout, lost = play_deck(Deck(draw_values, deck_size, rng, hazard), policy)
+        draws.append(n_draws)
+        payouts.append(payout)
+        losses.append(lost)
+    return draws, payouts, losses
+
+
+def read_draw_values(path):
+    """Read the rw_round column of a deck table."""
+    with open(path, newline = "") as deck_file:
+        return [float(row["rw_round"]) for row in csv.DictReader(deck_file)]
+
+
+def make_policy(name, rng):
+    """Policy from a command-line spec: fixed:<n>, ev[:<threshold>] or random[:<p_draw>]."""
+    kind, _, value = name.partition(":")
+    if kind == "fixed":
+        return FixedStopPolicy(int(value))
+    if kind == "ev":
+        return EVThresholdPolicy(float(value or 0))
+    if kind == "random":
+        return RandomPolicy(float(value or 0.5), rng)
+    raise ValueError(f"Unknown policy: {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Simulate CRCP decks with a participant policy")
+    parser.add_argument("deck_table", help = "deck table csv (data/setup/crcp_*_risk.csv)")
+    parser.add_argument("deck_size", type = int, help = "cards in the deck (MAX_DRAWS)")
+    parser.add_argument("--policy", default = "ev", help = "fixed:<n>, ev[:<threshold>] or random[:<p_draw>]")
+    parser.add_argument("--decks", type = int, default = 10000)
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--hazard", default = HAZARD_MODEL, choices = HAZARD_MODELS, help = "bad-card hazard model")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    draws, payouts, losses = simulate_decks(read_draw_values(args.deck_table), args.deck_size,
+                                            make_policy(args.policy, rng), args.decks, rng, args.hazard)
+
+    print(f"decks:        {args.decks}")
+    print(f"mean draws:   {sum(draws) / args.decks:.3f}")
+    print(f"mean payout:  {sum(payouts) / args.decks:.3f}")
+    print(f"loss rate:    {sum(losses) / args.decks:.4f}")
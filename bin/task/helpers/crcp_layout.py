@@ -0,0 +1,50 @@
+# CRCP screen layout
+# Window, stimulus and text settings of the CRCP screens, in pix units with
+# the origin at the center of the window. CRCP.py draws with them and the
+# session replay (replay.py) renders the same screens from a log.
+
+import math
+
+# Window and stimulus sizes
+WIN_WIDTH  = 1920
+WIN_HEIGHT = 1080
+WIN_COLOR  = "#666666"
+
+CARD_SIZE  = (250, 357)
+DECK_SIZE  = (250, 357)
+TOKEN_SIZE = (242.5, 300)
+BANK_SIZE  = (270, 275)
+
+# Text settings
+DECISION_SIZE   = 45
+DECISION_OFFSET = DECK_SIZE[1]/1.2
+
+OUTCOME_SIZE = 50
+CONTROL_SIZE = 35
+COUNTER_SIZE = 50
+SUMMARY_SIZE = 60
+CHOICE_SIZE  = 60
+
+SUMMARY_COLOR  = "#93FAEE"
+LOST_COLOR     = "#FFA6A3"
+EARNINGS_COLOR = "#ABFF94"
+CHOICE_COLOR   = "#F7E759"
+
+# Animation settings
+DECK_HOFFSET = -400
+DECK_VOFFSET = 0
+
+START_ANGLE = -90
+FINAL_ANGLE = 0
+ANGLE_INC   = 4
+
+MOV_STEPS = len(range(START_ANGLE, FINAL_ANGLE, ANGLE_INC))
+POS_INC   = 17.5
+
+# Stimulus positions and orientations
+DECK_POS  = [DECK_HOFFSET, DECK_VOFFSET]
+DECK_ORI  = math.radians(START_ANGLE)
+CARD_POS  = [DECK_HOFFSET + (MOV_STEPS * POS_INC), DECK_VOFFSET + 10]
+CARD_ORI  = math.radians(FINAL_ANGLE)
+TOKEN_POS = [-DECK_HOFFSET, DECK_VOFFSET-30]
+BANK_POS  = [0, -10]
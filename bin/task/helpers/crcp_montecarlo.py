@@ -0,0 +1,131 @@
+# Vectorized CRCP Monte Carlo
+# Batch simulation of CRCP decks with NumPy. Instead of playing each deck
+# draw by draw (crcp_engine.play_deck), the position of the bad card is drawn
+# for all decks at once from its exact distribution under the engine's
+# hazard, and the payout of every stopping rule follows from those positions:
+# stopping after s draws pays the pot of s good cards if the bad card comes
+# later, and nothing otherwise.
+#
+# From the repository root:
+#     python bin/task/helpers/crcp_montecarlo.py data/setup/crcp_high_risk.csv 17 --decks 10000000
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Allow running this file directly
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.crcp_engine import HAZARD_MODEL, HAZARD_MODELS, bad_card_probability, last_draw, read_draw_values
+
+
+def bad_card_pmf(deck_size, hazard = HAZARD_MODEL):
+    """Probability that the bad card is the k-th card drawn, for k = 1..deck_size."""
+    final_draw = last_draw(deck_size, hazard)
+    p_bad      = np.zeros(deck_size)
+    p_bad[:final_draw] = [bad_card_probability(deck_size, k, hazard) for k in range(1, final_draw + 1)]
+    survival = np.concatenate(([1.0], np.cumprod(1 - p_bad)[:-1]))
+    return p_bad * survival
+
+
+def sample_bad_positions(deck_size, n_decks, rng, hazard = HAZARD_MODEL):
+    """Draw number (1-based) at which the bad card shows up, for n_decks decks."""
+    cdf = np.cumsum(bad_card_pmf(deck_size, hazard))
+    cdf[last_draw(deck_size, hazard) - 1:] = 1.0
+    return np.searchsorted(cdf, rng.random(n_decks), side = "right").astype(np.int32) + 1
+
+
+def pot_after(draw_values, deck_size):
+    """Pot after s good draws, for every stopping rule s = 0..deck_size-1."""
+    values = np.asarray(draw_values, dtype = np.float64)[:deck_size - 1]
+    return np.concatenate(([0.0], np.cumsum(values)))
+
+
+def expected_payouts(draw_values, deck_size, hazard = HAZARD_MODEL):
+    """Exact expected payout of every stopping rule s = 0..deck_size-1."""
+    pmf = bad_card_pmf(deck_size, hazard)
+    p_survive = np.concatenate(([1.0], 1 - np.cumsum(pmf)))[:deck_size]
+    return pot_after(draw_values, deck_size) * np.clip(p_survive, 0, 1)
+
+
+def stopping_rule_payouts(draw_values, deck_size, n_decks, rng = None, chunk = 5_000_000, hazard = HAZARD_MODEL):
+    """Simulate n_decks decks and summarize the payout of every stopping rule.
+
+    Returns a dict of arrays indexed by the stopping rule s = 0..deck_size-1:
+    mean and sd of the payout per deck and the proportion of decks lost.
+    """
+    rng = rng or np.random.default_rng()
+    counts = np.zeros(deck_size + 1, dtype = np.int64)
+    for start in range(0, n_decks, chunk):
+        positions = sample_bad_positions(deck_size, min(chunk, n_decks - start), rng, hazard)
+        counts += np.bincount(positions, minlength = deck_size + 1)
+
+    # Decks whose bad card comes after draw s survive stopping rule s
+    survivors = n_decks - np.cumsum(counts)[:deck_size]
+    p_survive = survivors / n_decks
+    pots      = pot_after(draw_values, deck_size)
+
+    return {"draws":  np.arange(deck_size),
+            "mean":   pots * p_survive,
+            "sd":     pots * np.sqrt(p_survive * (1 - p_survive)),
+            "p_lose": 1 - p_survive}
+
+
+def session_payouts(draw_values, deck_size, decks_per_session, n_sessions, rng = None, chunk = 100_000,
+                    hazard = HAZARD_MODEL):
+    """Total payout of sessions of decks_per_session decks, for every stopping rule.
+
+    Returns an array of shape (n_sessions, deck_size): one column per stopping rule.
+    """
+    rng   = rng or np.random.default_rng()
+    pots  = pot_after(draw_values, deck_size)
+    total = np.empty((n_sessions, deck_size))
+
+    for start in range(0, n_sessions, chunk):
+        size      = min(chunk, n_sessions - start)
+        positions = sample_bad_positions(deck_size, size * decks_per_session, rng, hazard)
+        sessions  = np.repeat(np.arange(size), decks_per_session)
+
+        # Busts per session and draw, then survivors of each stopping rule
+        busts = np.bincount(sessions * (deck_size + 1) + positions, minlength = size * (deck_size + 1))
+        busts = busts.reshape(size, deck_size + 1)
+        survivors = decks_per_session - np.cumsum(busts, axis = 1)[:, :deck_size]
+        total[start:start + size] = survivors * pots
+
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Vectorized payout distributions for every CRCP stopping rule")
+    parser.add_argument("deck_table", help = "deck table csv (data/setup/crcp_*_risk.csv)")
+    parser.add_argument("deck_size", type = int, help = "cards in the deck (MAX_DRAWS)")
+    parser.add_argument("--decks", type = int, default = 1_000_000)
+    parser.add_argument("--session-decks", type = int, default = 30, help = "decks of this risk level per session")
+    parser.add_argument("--sessions", type = int, default = 0, help = "also simulate this many sessions")
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--hazard", default = HAZARD_MODEL, choices = HAZARD_MODELS, help = "bad-card hazard model")
+    args = parser.parse_args()
+
+    rng         = np.random.default_rng(args.seed)
+    draw_values = read_draw_values(args.deck_table)
+    result      = stopping_rule_payouts(draw_values, args.deck_size, args.decks, rng, hazard = args.hazard)
+    exact       = expected_payouts(draw_values, args.deck_size, args.hazard)
+
+    if args.sessions:
+        totals    = session_payouts(draw_values, args.deck_size, args.session_decks, args.sessions, rng,
+                                    hazard = args.hazard)
+        quantiles = np.percentile(totals, [5, 50, 95], axis = 0)
+
+    header = f"{'stop':>4} {'mean':>10} {'exact':>10} {'sd':>10} {'p_lose':>8}"
+    if args.sessions:
+        header += f" {'session p5':>11} {'p50':>10} {'p95':>10}"
+    print(header)
+
+    for s in result["draws"]:
+        line = f"{s:>4} {result['mean'][s]:>10.3f} {exact[s]:>10.3f} {result['sd'][s]:>10.3f} {result['p_lose'][s]:>8.4f}"
+        if args.sessions:
+            line += f" {quantiles[0][s]:>11.1f} {quantiles[1][s]:>10.1f} {quantiles[2][s]:>10.1f}"
+        print(line)
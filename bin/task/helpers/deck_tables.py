@@ -0,0 +1,146 @@
+# CRCP deck tables
+# The task only needs the value of each draw (the rw_round column of
+# data/setup/crcp_*_risk.csv), so every table is loaded once into a
+# contiguous float array with one value per card. Drawing a card is then a
+# plain array index.
+#
+# Before loading, every table is checked against the deck size the task
+# uses for it (MAX_DRAWS) and the engine's bad-card hazard: one row per card
+# and finite, positive values for every draw a deck can pay. Under the
+# "design" hazard the p_lose column must also equal the engine's bad-card
+# probability and the last row must have a zeroed rw_round (the last card is
+# the bad card for sure, so drawing it is worth nothing). An inconsistent
+# design raises DeckDesignError before the first trial.
+#
+# Check the committed tables from the repository root:
+#     python bin/task/helpers/deck_tables.py data/setup/crcp_low_risk.csv:49 data/setup/crcp_high_risk.csv:17
+
+import argparse
+import csv
+import math
+import os
+import sys
+
+import numpy as np
+
+# Allow running this file directly
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.crcp_engine import HAZARD_MODEL, HAZARD_MODELS, bad_card_probability, last_draw
+
+P_LOSE_TOLERANCE = 1e-9
+
+
+class DeckDesignError(ValueError):
+    """A deck table does not match the deck it is used for."""
+
+
+def read_deck_table(path):
+    """Numeric columns of a deck table (column -> list of floats, NA as nan)."""
+    with open(path, newline = "") as deck_file:
+        rows = list(csv.DictReader(deck_file))
+
+    columns = {}
+    for column in rows[0] if rows else []:
+        columns[column] = [math.nan if row[column] in ("", "NA") else float(row[column]) for row in rows]
+    return columns
+
+
+def check_deck_table(columns, deck_size, hazard = HAZARD_MODEL):
+    """Problems of a deck table used for a deck of deck_size cards (empty when consistent)."""
+    problems   = []
+    n_rows     = len(columns.get("rw_round", []))
+    final_draw = last_draw(deck_size, hazard)
+
+    for column in ["draw", "cards_left", "rw_round"] + (["p_lose"] if hazard == "design" else []):
+        if column not in columns:
+            problems.append(f"missing column {column}")
+    if problems:
+        return problems
+
+    if n_rows != deck_size:
+        problems.append(f"{n_rows} rows for a deck of {deck_size} cards")
+    if columns["cards_left"] and columns["cards_left"][0] != deck_size:
+        problems.append(f"generated for a deck of {columns['cards_left'][0]:g} cards, not {deck_size}")
+    if columns["draw"] != list(range(1, n_rows + 1)):
+        problems.append("draw column is not 1, 2, ..., n")
+
+    # Only the design hazard follows the table's p_lose column
+    if hazard == "design":
+        for draw, p_lose in zip(range(1, min(n_rows, deck_size) + 1), columns["p_lose"]):
+            p_task = bad_card_probability(deck_size, draw, hazard)
+            if not abs(p_lose - p_task) <= P_LOSE_TOLERANCE:
+                problems.append(f"p_lose at draw {draw} is {p_lose:.6g}, the task uses {p_task:.6g}")
+                break
+
+    # Every draw up to the bad card for sure is shown on the decision screen,
+    # every draw before it can be paid
+    values = columns["rw_round"][:final_draw]
+    for draw, value in enumerate(values, start = 1):
+        if not math.isfinite(value) or (value <= 0 and draw < final_draw):
+            problems.append(f"rw_round at draw {draw} is {value:g}; every draw before draw {final_draw} "
+                            f"must pay a finite, positive value")
+            break
+
+    if hazard == "design" and n_rows >= deck_size and values[deck_size - 1] != 0:
+        problems.append(f"rw_round at the last draw ({deck_size}) is {values[deck_size - 1]:g}, not 0")
+
+    return problems
+
+
+def load_draw_values(path, deck_size, strict = True):
+    """Draw values of a deck table as a float array of length deck_size.
+
+    With strict = False, problems are printed as warnings instead of raising
+    DeckDesignError (missing draw values still raise).
+    """
+    columns  = read_deck_table(path)
+    problems = check_deck_table(columns, deck_size)
+
+    if problems:
+        message = f"{path} (deck of {deck_size} cards):\n  " + "\n  ".join(problems)
+        if strict:
+            raise DeckDesignError(message)
+        print(f"WARNING: inconsistent deck table {message}")
+
+    values = np.array(columns.get("rw_round", []), dtype = np.float64)
+    if len(values) < deck_size:
+        raise DeckDesignError(f"{path} has {len(values)} draw values, a deck of {deck_size} cards needs {deck_size}")
+    return np.ascontiguousarray(values[:deck_size])
+
+
+def load_deck_tables(paths, deck_sizes, strict = True):
+    """Draw value arrays for every risk level, in the order of deck_sizes (MAX_DRAWS).
+
+    Every table is checked before any is returned, so a single error lists
+    the problems of all of them.
+    """
+    tables, errors = [], []
+    for path, deck_size in zip(paths, deck_sizes):
+        try:
+            tables.append(load_draw_values(path, deck_size, strict))
+        except DeckDesignError as error:
+            errors.append(str(error))
+
+    if errors:
+        raise DeckDesignError("Deck design does not match the task settings:\n" + "\n".join(errors))
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Check CRCP deck tables against their deck sizes")
+    parser.add_argument("tables", nargs = "+", help = "deck_table:deck_size pairs, e.g. data/setup/crcp_high_risk.csv:17")
+    parser.add_argument("--hazard", default = HAZARD_MODEL, choices = HAZARD_MODELS, help = "bad-card hazard model")
+    args = parser.parse_args()
+
+    failed = False
+    for spec in args.tables:
+        path, _, deck_size = spec.rpartition(":")
+        problems = check_deck_table(read_deck_table(path), int(deck_size), args.hazard)
+        print(f"{path}: OK" if not problems else f"{path}:")
+        for problem in problems:
+            print(f"  {problem}")
+        failed = failed or bool(problems)
+
+    raise SystemExit(1 if failed else 0)
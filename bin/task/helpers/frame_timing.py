@@ -0,0 +1,170 @@
+# Frame timing instrumentation
+# Wraps a window's flip() to timestamp every frame into preallocated ring
+# buffers, tagged with the task routine that requested the flip. Routines are
+# tagged with the @routine decorator, which costs one assignment per call and
+# is harmless when no FrameTimer is installed. Loops that switch screens
+# within one call tag their phases with set_routine().
+#
+# Intervals are only measured between flips of the same routine call, so the
+# time spent between routines is never counted as a frame. Routines that wait
+# for input between flips (animated = False) still report their intervals, but
+# those are not counted as dropped frames.
+#
+# Every flip also records the CPU time of the task's thread, so the summary
+# reports how much CPU each routine spent producing its frames.
+
+import csv
+import functools
+import itertools
+import time
+
+import numpy as np
+from psychopy import core
+
+DROP_FACTOR = 1.5  # an interval longer than this many refresh periods is a dropped frame
+
+_names    = ["other"]
+_animated = [False]
+_current  = 0
+_call     = 0
+_calls    = itertools.count(1)
+
+
+def routine(name, animated = True):
+    """Decorator tagging every flip made inside the function with name."""
+    if name not in _names:
+        _names.append(name)
+        _animated.append(animated)
+    code = _names.index(name)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def tagged(*args, **kwargs):
+            global _current, _call
+            previous = (_current, _call)
+            _current = code
+            _call    = next(_calls)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _current, _call = previous
+        return tagged
+
+    return decorate
+
+
+def set_routine(name, animated = False):
+    """Tag the following flips with name until the enclosing routine call returns.
+
+    For loops that switch between screens (phases) inside one routine call.
+    Calling it again with the phase already set keeps measuring its frames.
+    """
+    global _current, _call
+    if name not in _names:
+        _names.append(name)
+        _animated.append(animated)
+    code = _names.index(name)
+    if code != _current:
+        _current = code
+        _call    = next(_calls)
+
+
+class FrameTimer:
+    """Records a timestamp, routine and routine call for every flip of win."""
+
+    def __init__(self, win, capacity = 2**17, refresh_rate = None):
+        if refresh_rate is None:
+            refresh_rate = win.getActualFrameRate() or 60.0
+
+        self.win          = win
+        self.frame_period = 1.0 / refresh_rate
+        self.capacity     = capacity
+        self.count        = 0
+
+        self.times    = np.zeros(capacity, dtype = np.float64)
+        self.routines = np.zeros(capacity, dtype = np.int16)
+        self.calls    = np.zeros(capacity, dtype = np.int64)
+        self.cpu      = np.zeros(capacity, dtype = np.float64)
+
+        self._flip = win.flip
+        win.flip   = self.flip
+
+    def flip(self, *args, **kwargs):
+        """Flip the window and record when it returned."""
+        result = self._flip(*args, **kwargs)
+        index  = self.count % self.capacity
+        self.times[index]    = core.getTime()
+        self.routines[index] = _current
+        self.calls[index]    = _call
+        self.cpu[index]      = time.thread_time()
+        self.count += 1
+        return result
+
+    def uninstall(self):
+        """Restore the window's own flip()."""
+        self.win.flip = self._flip
+
+    def order(self):
+        """Buffer indices of the recorded frames, oldest first."""
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        return np.roll(np.arange(self.capacity), -(self.count % self.capacity))
+
+    def frames(self):
+        """Recorded frames in order as (times, routines, intervals); intervals are NaN across calls."""
+        order    = self.order()
+        times    = self.times[order]
+        routines = self.routines[order]
+        calls    = self.calls[order]
+
+        intervals = np.full(len(times), np.nan)
+        same_call = (calls[1:] == calls[:-1]) & (routines[1:] == routines[:-1])
+        intervals[1:][same_call] = np.diff(times)[same_call]
+        return times, routines, intervals
+
+    def cpu_intervals(self):
+        """CPU time of the task's thread between recorded frames, NaN where intervals are."""
+        _, _, intervals = self.frames()
+        cpu = np.full(len(intervals), np.nan)
+        cpu[1:] = np.diff(self.cpu[self.order()])
+        cpu[np.isnan(intervals)] = np.nan
+        return cpu
+
+    def summary(self):
+        """Per-routine frame-time percentiles (ms), CPU time (ms) and dropped-frame counts."""
+        _, routines, intervals = self.frames()
+        cpu  = self.cpu_intervals()
+        rows = []
+        for code, name in enumerate(_names):
+            measured    = (routines == code) & ~np.isnan(intervals)
+            frame_times = intervals[measured]
+            if len(frame_times) == 0:
+                continue
+
+            p50, p95, p99 = np.percentile(frame_times, [50, 95, 99]) * 1000
+            if _animated[code]:
+                dropped = int(np.sum(frame_times > DROP_FACTOR * self.frame_period))
+            else:
+                dropped = 0
+
+            rows.append({"routine": name,
+                         "frames":  len(frame_times),
+                         "p50_ms":  round(float(p50), 3),
+                         "p95_ms":  round(float(p95), 3),
+                         "p99_ms":  round(float(p99), 3),
+                         "cpu_ms":  round(float(np.sum(cpu[measured])) * 1000, 3),
+                         "dropped": dropped})
+        return rows
+
+    def save(self, path):
+        """Write every recorded frame to a csv file and return the summary."""
+        times, routines, intervals = self.frames()
+        with open(path, "w", newline = "") as frame_file:
+            writer = csv.writer(frame_file)
+            writer.writerow(["frame", "time", "interval", "routine"])
+            first = self.count - len(times)
+            for i in range(len(times)):
+                interval = "" if np.isnan(intervals[i]) else repr(float(intervals[i]))
+                writer.writerow([first + i, repr(float(times[i])), interval, _names[routines[i]]])
+
+        return self.summary()
@@ -0,0 +1,156 @@
+# Keyboard input backends
+# The tasks read the keyboard through one of these backends, selected with
+# KEY_BACKEND. Every backend returns key presses as (key, time) pairs, with
+# the time of the key down on the clock the backend was opened with:
+# - "ptb": psychopy.hardware.keyboard.Keyboard on psychtoolbox. The keyboard
+#   is read by its own queue in the background and every press carries the
+#   hardware timestamp of the key down, so timing does not depend on when the
+#   task gets around to polling or on render load
+# - "event": psychopy.event. Presses are timestamped when the window's event
+#   loop dispatches them, so timing is only accurate to the frame
+# - "fake": simulated presses on the given clock, for headless runs and tests
+#
+# "ptb" falls back to "event" when psychtoolbox is not installed.
+
+import importlib.util
+import random
+import time
+
+KEY_BACKENDS = ("ptb", "event", "fake")
+
+
+class EventKeys:
+    """Keyboard read through psychopy.event."""
+
+    def __init__(self, clock):
+        from psychopy import event
+
+        self.event = event
+        self.clock = clock
+
+    def get_keys(self, key_list = None):
+        """Presses since the last call, without waiting."""
+        return [tuple(key) for key in self.event.getKeys(keyList = key_list, timeStamped = self.clock)]
+
+    def wait_keys(self, key_list = None, max_wait = float("inf"), clear = True):
+        """Wait for a press; empty when max_wait seconds pass without one.
+
+        Presses made before the call are discarded unless clear is False.
+        """
+        keys = self.event.waitKeys(maxWait = max_wait, keyList = key_list, timeStamped = self.clock,
+                                   clearEvents = clear)
+        return [tuple(key) for key in keys or []]
+
+    def clear(self):
+        """Discard every press not read yet."""
+        self.event.clearEvents(eventType = "keyboard")
+
+
+class PtbKeys:
+    """Keyboard read through psychtoolbox's key queue, with hardware timestamps."""
+
+    def __init__(self, clock):
+        from psychopy.hardware import keyboard
+
+        self.keyboard = keyboard.Keyboard(clock = clock)
+
+    def get_keys(self, key_list = None):
+        """Presses since the last call, without waiting."""
+        return [(key.name, key.rt) for key in self.keyboard.getKeys(keyList = key_list, waitRelease = False)]
+
+    def wait_keys(self, key_list = None, max_wait = float("inf"), clear = True):
+        """Wait for a press; empty when max_wait seconds pass without one.
+
+        Presses made before the call are discarded unless clear is False.
+        """
+        keys = self.keyboard.waitKeys(maxWait = max_wait, keyList = key_list, waitRelease = False, clear = clear)
+        return [(key.name, key.rt) for key in keys or []]
+
+    def clear(self):
+        """Discard every press not read yet."""
+        self.keyboard.clearEvents()
+
+
+class FakeKeys:
+    """Simulated participant at the keyboard.
+
+    Repeated presses come every press_interval seconds on average and answers
+    to wait_keys() after response_time seconds on average (both exponentially
+    distributed), so slow answers time out like real ones. The first press
+    after clear() chooses a key at random and the following presses keep to
+    it, as a participant pressing for the action they chose; each press hits
+    another key instead with probability stray, without changing the choice.
+    Answers are any of the requested keys; keys in ignore (the quit key) are
+    never pressed.
+    """
+
+    def __init__(self, clock, press_interval = 0.15, response_time = 0.8, stray = 0.02,
+                 ignore = ("escape",), rng = None):
+        self.clock          = clock
+        self.press_interval = press_interval
+        self.response_time  = response_time
+        self.stray          = stray
+        self.ignore         = set(ignore)
+        self.rng            = rng or random.Random()
+
+        self.last_key   = None
+        self.next_press = None
+
+    def choose(self, key_list, stray = 0, keep = True):
+        keys = [key for key in key_list or [] if key not in self.ignore]
+        if not keys:
+            return None
+        if not keep or self.last_key not in keys:
+            self.last_key = self.rng.choice(keys)
+            return self.last_key
+        others = [key for key in keys if key != self.last_key]
+        if others and self.rng.random() < stray:
+            return self.rng.choice(others)
+        return self.last_key
+
+    def get_keys(self, key_list = None):
+        """Presses due since the last call, without waiting."""
+        now = self.clock.getTime()
+        if self.next_press is None:
+            self.next_press = now + self.rng.expovariate(1 / self.press_interval)
+
+        presses = []
+        while self.next_press <= now:
+            key = self.choose(key_list, self.stray)
+            if key is not None:
+                presses.append((key, self.next_press))
+            self.next_press += self.rng.expovariate(1 / self.press_interval)
+        return presses
+
+    def wait_keys(self, key_list = None, max_wait = float("inf"), clear = True):
+        """Wait for a simulated answer; empty when it would come after max_wait."""
+        if clear:
+            self.clear()
+
+        start = self.clock.getTime()
+        delay = self.rng.expovariate(1 / self.response_time)
+        key   = self.choose(key_list, keep = False)
+        if key is None or delay > max_wait:
+            time.sleep(max_wait if max_wait != float("inf") else 0)
+            return []
+
+        time.sleep(delay)
+        return [(key, start + delay)]
+
+    def clear(self):
+        """Discard every press not read yet; the next press chooses a key again."""
+        self.next_press = None
+        self.last_key   = None
+
+
+def open_key_input(backend, clock):
+    """Keyboard backend ("ptb", "event" or "fake") timestamping presses on clock."""
+    if backend not in KEY_BACKENDS:
+        raise ValueError(f"Unknown keyboard backend {backend!r}, use one of {', '.join(KEY_BACKENDS)}")
+
+    if backend == "ptb" and importlib.util.find_spec("psychtoolbox") is None:
+        print("WARNING: psychtoolbox is not installed, reading the keyboard through psychopy.event "
+              "(timing accurate to the frame)")
+        backend = "event"
+
+    return {"ptb": PtbKeys, "event": EventKeys, "fake": FakeKeys}[backend](clock)
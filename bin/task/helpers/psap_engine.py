@@ -0,0 +1,304 @@
+# PSAP game logic and session simulator
+# Schedule rules of the Point Subtraction Aggression Paradigm (press
+# thresholds, adverse-event and shield timers per condition, incident
+# effects), shared by psap.py and a discrete-event simulation of the task
+# driven by a virtual clock. Simulated participants are a strategy (which
+# action to choose) plus a press model (how fast they decide and press), so
+# thousands of 25-minute sessions run in seconds.
+#
+# Timers are kept in an EventScheduler, which psap.py polls every frame on the
+# task clock and the simulator advances event by event. Adverse events fire
+# as soon as they are due (or when the shield that blocked them expires) and
+# pause the trial in progress while they are on screen.
+#
+# From the repository root:
+#     python bin/task/helpers/psap_engine.py --condition A --sessions 2000
+
+import argparse
+import random
+
+ACTIONS = ["Earn", "Deduct", "Protect"]
+
+EARN_PRESSES   = 30
+ACTION_PRESSES = 10
+
+TASK_DURATION     = 1500
+PRACTICE_DURATION = 90
+PRACTICE_INTERVAL = 20  # fixed time between practice incidents
+PRACTICE_SHIELD   = 4
+
+
+def press_threshold(action):
+    """Key presses needed to complete an action."""
+    return EARN_PRESSES if action == "Earn" else ACTION_PRESSES
+
+
+def adverse_threshold(condition, practice = False, rng = random):
+    """Time without Deduct/Protect before the next adverse event."""
+    if practice:
+        return PRACTICE_INTERVAL
+    if condition == "A":     # opponent steals
+        return rng.uniform(6, 60)
+    if condition == "B":     # random glitch
+        return rng.uniform(400, 500)
+    return 100000            # neutral, no negative events
+
+
+def first_shield_threshold(practice = False, rng = random):
+    """Protection time of the first shield."""
+    return PRACTICE_SHIELD if practice else rng.uniform(4, 5.8)
+
+
+def next_shield_threshold(rng = random):
+    """Protection time after a shield has expired."""
+    return rng.uniform(4.5, 5.5)
+
+
+def outcome_interval(rng = random):
+    """How long an outcome or incident message stays on screen."""
+    return rng.uniform(0.9, 1.1)
+
+
+def incident_kind(condition, practice, incident_counter):
+    """Adverse event type: "steal" or "glitch" (practice alternates both)."""
+    if practice:
+        return "steal" if incident_counter % 2 == 0 else "glitch"
+    return "steal" if condition == "A" else "glitch"
+
+
+def apply_incident(kind, score):
+    """Score after an adverse event: a steal takes one point, a glitch halves the score."""
+    return score - 1 if kind == "steal" else score / 2
+
+
+class EventScheduler:
+    """Named timers on a shared clock; each name holds at most one due time."""
+
+    def __init__(self):
+        self._due = {}
+
+    def schedule(self, name, due):
+        self._due[name] = due
+
+    def cancel(self, name):
+        self._due.pop(name, None)
+
+    def due(self, name):
+        return self._due.get(name)
+
+    def shift(self, names, delta):
+        """Postpone the given timers, if scheduled, by delta."""
+        for name in names:
+            if name in self._due:
+                self._due[name] += delta
+
+    def next_event(self):
+        """Earliest (name, due) pair, or None when nothing is scheduled."""
+        if not self._due:
+            return None
+        name = min(self._due, key = self._due.get)
+        return name, self._due[name]
+
+    def pop_due(self, now):
+        """Remove and return the (name, due) pairs that are due at now, earliest first."""
+        ready = sorted((due, name) for name, due in self._due.items() if due <= now)
+        for _, name in ready:
+            del self._due[name]
+        return [(name, due) for due, name in ready]
+
+
+# Strategies choose an action from the session state
+class MixStrategy:
+    """Chooses actions with fixed probabilities."""
+
+    def __init__(self, p_earn = 0.8, p_deduct = 0.1, p_protect = 0.1):
+        self.weights = [p_earn, p_deduct, p_protect]
+
+    def __call__(self, state, rng):
+        return rng.choices(ACTIONS, self.weights)[0]
+
+
+class RetaliateStrategy:
+    """Earns by default and deducts (or protects) for a while after each incident."""
+
+    def __init__(self, window = 10, p_retaliate = 0.7, p_protect = 0.2, base = None):
+        self.window      = window
+        self.p_retaliate = p_retaliate
+        self.p_protect   = p_protect
+        self.base        = base or MixStrategy(1, 0, 0)
+
+    def __call__(self, state, rng):
+        if state.incidents and state.time - state.last_incident < self.window:
+            draw = rng.random()
+            if draw < self.p_retaliate:
+                return "Deduct"
+            if draw < self.p_retaliate + self.p_protect:
+                return "Protect"
+        return self.base(state, rng)
+
+
+STRATEGIES = {"earn":      lambda: MixStrategy(1, 0, 0),
+              "mix":       MixStrategy,
+              "retaliate": RetaliateStrategy}
+
+
+class GammaPressModel:
+    """Decision times and inter-press intervals drawn from gamma distributions."""
+
+    def __init__(self, decision_mean = 0.9, press_mean = 0.17, shape = 4.0):
+        self.decision_mean = decision_mean
+        self.press_mean    = press_mean
+        self.shape         = shape
+
+    def decision_time(self, rng):
+        return rng.gammavariate(self.shape, self.decision_mean / self.shape)
+
+    def press_interval(self, rng):
+        return rng.gammavariate(self.shape, self.press_mean / self.shape)
+
+    def presses_time(self, n_presses, rng):
+        """Time for n_presses consecutive presses (a sum of gammas is a gamma)."""
+        if n_presses <= 0:
+            return 0.0
+        return rng.gammavariate(n_presses * self.shape, self.press_mean / self.shape)
+
+
+class SessionState:
+    """Observable state of a simulated session, handed to strategies."""
+
+    def __init__(self):
+        self.time          = 0.0
+        self.score         = 0
+        self.shielded      = False
+        self.incidents     = 0
+        self.last_incident = 0.0
+
+
+def simulate_session(condition, strategy, press_model, practice = False, duration = None, rng = None):
+    """Simulate one session on a virtual clock.
+
+    Mirrors psap(): a trial is a decision, the presses of the chosen action
+    and an outcome message. Adverse events fire when their timer is due
+    (after the shield expires if one is up) and pause the trial in progress
+    while they are on screen. The trial that starts after the task duration
+    is the last one. Returns (final state, trials, incidents); trials are
+    (action, start, end) tuples and incidents (due, shown) pairs, in task time.
+    """
+    rng = rng or random.Random()
+    if duration is None:
+        duration = PRACTICE_DURATION if practice else TASK_DURATION
+
+    state     = SessionState()
+    trials    = []
+    incidents = []
+    trial     = ("decision", 0.0, False)  # phase, start, last trial
+
+    adverse_limit = adverse_threshold(condition, practice, rng)
+    shield_limit  = first_shield_threshold(practice, rng)
+    pending       = None  # due time of an adverse event blocked by the shield
+
+    scheduler = EventScheduler()
+    scheduler.schedule("adverse", adverse_limit)
+    scheduler.schedule("choice", press_model.decision_time(rng))
+    action = strategy(state, rng)
+
+    while True:
+        name, due  = scheduler.next_event()
+        state.time = due
+        scheduler.cancel(name)
+
+        if name == "shield":
+            state.shielded = False
+            shield_limit   = next_shield_threshold(rng)
+            if pending is None:
+                continue
+            name, due, pending = "adverse", pending, None
+
+        if name == "adverse":
+            if state.shielded:
+                pending = due
+                continue
+
+            state.incidents    += 1
+            state.last_incident = state.time
+            incidents.append((due, state.time))
+
+            kind          = incident_kind(condition, practice, state.incidents)
+            state.score   = apply_incident(kind, state.score)
+            adverse_limit = adverse_threshold(condition, practice, rng)
+
+            # The incident message pauses the trial in progress
+            display = outcome_interval(rng)
+            scheduler.shift(["choice", "done", "outcome_end"], display)
+            scheduler.schedule("incident_end", state.time + display)
+
+        elif name == "incident_end":
+            scheduler.schedule("adverse", state.time + adverse_limit)
+
+        elif name == "choice":
+            scheduler.schedule("done", state.time + press_model.presses_time(press_threshold(action) - 1, rng))
+
+        elif name == "done":
+            trials.append((action, trial[1], state.time))
+
+            if action == "Earn":
+                state.score += 1
+            elif action == "Protect":
+                state.shielded = True
+                pending        = None
+                scheduler.schedule("shield", state.time + shield_limit)
+                scheduler.schedule("adverse", state.time + adverse_limit)
+            elif action == "Deduct":
+                pending = None
+                scheduler.schedule("adverse", state.time + adverse_limit)
+
+            scheduler.schedule("outcome_end", state.time + outcome_interval(rng))
+
+        elif name == "outcome_end":
+            if trial[2]:
+                return state, trials, incidents
+
+            trial  = ("decision", state.time, state.time > duration)
+            action = strategy(state, rng)
+            scheduler.schedule("choice", state.time + press_model.decision_time(rng))
+
+
+def simulate_condition(condition, strategy, press_model, n_sessions, practice = False, seed = None):
+    """Incident counts and final scores of n_sessions simulated sessions."""
+    rng = random.Random(seed)
+    incident_counts, scores = [], []
+    for _ in range(n_sessions):
+        state, _, _ = simulate_session(condition, strategy, press_model, practice, rng = rng)
+        incident_counts.append(state.incidents)
+        scores.append(state.score)
+    return incident_counts, scores
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Simulate PSAP sessions with scripted participants")
+    parser.add_argument("--condition", choices = ["A", "B", "C"], default = "A")
+    parser.add_argument("--strategy", choices = sorted(STRATEGIES), default = "mix")
+    parser.add_argument("--sessions", type = int, default = 1000)
+    parser.add_argument("--decision-mean", type = float, default = 0.9, help = "mean decision time (s)")
+    parser.add_argument("--press-mean", type = float, default = 0.17, help = "mean interval between presses (s)")
+    parser.add_argument("--practice", action = "store_true")
+    parser.add_argument("--seed", type = int, default = None)
+    args = parser.parse_args()
+
+    press_model = GammaPressModel(args.decision_mean, args.press_mean)
+    incident_counts, scores = simulate_condition(args.condition, STRATEGIES[args.strategy](), press_model,
+                                                 args.sessions, args.practice, args.seed)
+
+    minutes = (PRACTICE_DURATION if args.practice else TASK_DURATION) / 60
+    print(f"sessions:          {args.sessions}")
+    print(f"incidents/session: mean {sum(incident_counts) / args.sessions:.2f}, "
+          f"p5 {percentile(incident_counts, 5)}, p50 {percentile(incident_counts, 50)}, "
+          f"p95 {percentile(incident_counts, 95)}")
+    print(f"incidents/minute:  {sum(incident_counts) / args.sessions / minutes:.3f}")
+    print(f"final score:       mean {sum(scores) / args.sessions:.2f}")
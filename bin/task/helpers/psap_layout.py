@@ -0,0 +1,51 @@
+# PSAP screen layout
+# Window, stimulus and text settings of the PSAP screens, in pix units with
+# the origin at the center of the window. psap.py draws with them and the
+# session replay (replay.py) renders the same screens from a log.
+
+# Window settings
+WIN_WIDTH  = 1920
+WIN_HEIGHT = 1080
+WIN_COLOR  = "#666666"
+
+# Text settings
+CONTROL_SIZE = 50
+SCORE_SIZE   = 60
+N_KEY_SIZE   = 50
+SUMMARY_SIZE = 80
+
+SHIELDED_COLOR = "#93FAEE"
+LOST_COLOR     = "#FFA6A3"
+EARNINGS_COLOR = "#ABFF94"
+SUMMARY_COLOR  = "#F7E759"
+
+# Stim settings
+BUTTON_COLORS = ["#9E005D", "#2E5892", "#F7931E"]
+
+BUTTON_SIZE  = [250, 250]
+STATUS_SIZE  = [100, 90]
+AVATAR_SIZE  = [200, 200]
+PROFILE_SIZE = [300, 300]
+
+# Screen positions
+BUTTON_POS = [[-500, 0],
+              [0, 0],
+              [500, 0]]
+
+AVATAR_POS = [[-330,  170], [-110,  170], [110,  170], [330,  170],
+              [-330,  -50], [-110,  -50], [110,  -50], [330,  -50],
+              [-330, -270], [-110, -270], [110, -270], [330, -270]]
+
+CTRL_POS = [[BUTTON_POS[0][0], BUTTON_POS[0][1] - 200],
+            [BUTTON_POS[1][0], BUTTON_POS[1][1] - 200],
+            [BUTTON_POS[2][0], BUTTON_POS[2][1] - 200]]
+
+SCORE_POS  = [0, BUTTON_POS[0][1] + 370]
+COUNT_POS  = [SCORE_POS[0], SCORE_POS[1] - 70]
+
+KEY_POS    = [SCORE_POS[0], -250]
+N_KEY_POS  = [KEY_POS[0] + 50, KEY_POS[1] - 70]
+
+STATUS_POS = [SCORE_POS[0] - 135, COUNT_POS[1] - 5]
+
+MESSAGE_POS = [0, 100]  # outcome and incident messages
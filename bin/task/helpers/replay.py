@@ -0,0 +1,536 @@
+# Session replay
+# Rebuilds the screens of a CRCP or PSAP session from its csv log and renders
+# them without a window (a PNG sequence, or a video when imageio is
+# installed), or steps through them in a PsychoPy window. Screens are drawn
+# with the tasks' own layout settings (crcp_layout.py, psap_layout.py) and
+# stimulus images, so a replayed screen is the one the participant saw, up to
+# what the log does not record:
+# - CRCP: the card flip animation is shown at its last frame
+# - PSAP: the press counter is shown at its last value before the outcome,
+#   and adverse events are shown before the decision screen of the trial
+#   during which they happened
+#
+# The log is read through SessionLog's row index. The state of every screen
+# (pot, cards left, bank, score, incidents) is worked out once from the index
+# columns, and rendering a screen reads only its own row, so jumping to any
+# point of a session is immediate.
+#
+# From the repository root:
+#     python bin/task/helpers/replay.py data/crcp/crcp-1-<date>.csv --frames replay/
+#     python bin/task/helpers/replay.py data/psap/psap-1-A-<date>.csv --video replay.mp4 --hold 30
+#     python bin/task/helpers/replay.py data/psap/psap-1-A-<date>.csv --interactive
+
+import argparse
+import bisect
+import glob
+import os
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Allow running this file directly
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import crcp_layout, psap_layout
+from helpers.deck_tables import read_deck_table
+from helpers.psap_engine import apply_incident, incident_kind, press_threshold
+from helpers.session_log import SessionLog, detect_task
+from helpers.stim_atlas import stim_decoder
+
+DIR_BASE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+DIR_DSET = os.path.join(DIR_BASE, "data", "setup")
+DIR_TEST = os.path.join(DIR_BASE, "data", "tests")
+DIR_STIM = os.path.join(DIR_BASE, "figures", "stim")
+
+# Task settings the log does not record, as in CRCP.py and psap.py
+CRCP_DECK_TABLES = {49: "crcp_low_risk.csv", 25: "crcp_med_risk.csv", 17: "crcp_high_risk.csv"}
+CRCP_BREAKS      = range(19, 89, 20)
+
+PSAP_KEYS      = ["s", "h", "l"]  # keys of the action_01-03 columns
+PSAP_KEY_NAMES = ["S", "H", "L"]
+
+# Regular and bold fonts, first found is used
+FONTS = {False: ["arial.ttf", "Arial.ttf", "DejaVuSans.ttf"],
+         True:  ["arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf"]}
+
+# Interactive viewer keys
+VIEW_KEYS = {"right": 1, "space": 1, "left": -1, "backspace": -1}
+
+
+def stim_path(pattern):
+    """The stimulus file matching a glob pattern in figures/stim."""
+    paths = sorted(glob.glob(os.path.join(DIR_STIM, pattern)))
+    if not paths:
+        raise FileNotFoundError(f"No stimulus image matches {pattern} in {DIR_STIM}")
+    return paths[0]
+
+
+class Renderer:
+    """Draws images and text on a window-sized frame the way ImageStim and TextStim place them.
+
+    Positions are in pix with the origin at the center of the window and y
+    pointing up; ori is in degrees, clockwise.
+    """
+
+    def __init__(self, size, color, source = "atlas"):
+        self.size    = (int(size[0]), int(size[1]))
+        self.color   = color
+        self.decode  = stim_decoder(source)
+        self._images = {}
+        self._fonts  = {}
+
+    def new_frame(self):
+        self.frame = Image.new("RGB", self.size, self.color)
+        self.pen   = ImageDraw.Draw(self.frame)
+        return self.frame
+
+    def to_frame(self, pos):
+        return self.size[0] / 2 + pos[0], self.size[1] / 2 - pos[1]
+
+    def image(self, path, size, pos, ori = 0):
+        key   = (path, tuple(size))
+        image = self._images.get(key)
+        if image is None:
+            image = self._images[key] = self.decode(path, size).convert("RGBA")
+
+        if ori:
+            image = image.rotate(-ori, resample = Image.BICUBIC, expand = True)
+
+        x, y = self.to_frame(pos)
+        self.frame.paste(image, (int(round(x - image.width / 2)), int(round(y - image.height / 2))), image)
+
+    def font(self, height, bold = False):
+        key  = (int(round(height)), bold)
+        font = self._fonts.get(key)
+        if font is None:
+            for name in FONTS[bold]:
+                try:
+                    font = ImageFont.truetype(name, key[0])
+                    break
+                except OSError:
+                    continue
+            else:
+                font = ImageFont.load_default(key[0])
+            self._fonts[key] = font
+        return font
+
+    def wrap(self, text, font, wrap_width):
+        """Break lines longer than wrap_width at spaces, as TextStim does."""
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split(" "):
+                candidate = f"{line} {word}" if line else word
+                if line and self.pen.textlength(candidate, font = font) > wrap_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return "\n".join(lines)
+
+    def text(self, text, pos, height, color = "white", bold = False, wrap_width = 1000):
+        """Centered text with letter height in pix."""
+        font = self.font(height, bold)
+        text = self.wrap(text, font, wrap_width)
+        self.pen.multiline_text(self.to_frame(pos), text, fill = color, font = font, anchor = "mm",
+                                align = "center", spacing = height * 0.2)
+
+
+class Replay:
+    """Screens of a session log, rendered on demand.
+
+    Subclasses set the task's layout module and index columns, build() the
+    list of screens (dicts with the screen kind and the log row it shows) and
+    draw every kind of screen with a draw_<kind>(screen, row) method.
+    """
+
+    layout        = None
+    index_columns = ()
+
+    def __init__(self, log, practice = False, source = "atlas", scale = 1):
+        self.log      = log
+        self.practice = practice
+        self.scale    = scale
+        self.renderer = Renderer((self.layout.WIN_WIDTH, self.layout.WIN_HEIGHT), self.layout.WIN_COLOR, source)
+        self.screens  = self.build()
+
+        # First screen of every row, to jump between trials
+        self.row_starts = []
+        for i, screen in enumerate(self.screens):
+            if screen["row"] is not None and (not self.row_starts or self.screens[self.row_starts[-1]]["row"] != screen["row"]):
+                self.row_starts.append(i)
+
+    def __len__(self):
+        return len(self.screens)
+
+    def render(self, i):
+        """Image of screen i."""
+        screen = self.screens[i]
+        row    = self.log.row(screen["row"]) if screen["row"] is not None else None
+
+        frame = self.renderer.new_frame()
+        getattr(self, "draw_" + screen["kind"])(screen, row)
+        if self.scale != 1:
+            frame = frame.resize((int(frame.width * self.scale), int(frame.height * self.scale)), Image.LANCZOS)
+        return frame
+
+    def describe(self, i):
+        screen = self.screens[i]
+        row    = "" if screen["row"] is None else f", row {screen['row'] + 1} of {len(self.log)}"
+        return f"screen {i + 1} of {len(self)}: {screen['kind']}{row}"
+
+    def trial_start(self, i, step):
+        """First screen of the trial step trials away from the one screen i belongs to."""
+        current = bisect.bisect_right(self.row_starts, i) - 1
+        target  = min(max(current + step, 0), len(self.row_starts) - 1)
+        return self.row_starts[target] if self.row_starts else i
+
+
+class CrcpReplay(Replay):
+    """Decision, card, summary and final screens of a CRCP session."""
+
+    layout        = crcp_layout
+    index_columns = ("deck_number", "risk", "pot", "draw", "choice", "failed")
+
+    def __init__(self, log, practice = False, source = "atlas", scale = 1):
+        # Draw values of every deck size, to show the value of a draw that turned out bad
+        self.deck_values = {}
+        for deck_size, file_name in CRCP_DECK_TABLES.items():
+            path = os.path.join(DIR_DSET, file_name)
+            if os.path.exists(path):
+                self.deck_values[deck_size] = read_deck_table(path)["rw_round"]
+
+        # Deck, card back and token images of every deck color
+        self.deck_images = {}
+        for deck_path in glob.glob(os.path.join(DIR_STIM, "deck*.png")):
+            _, letter, color = os.path.basename(deck_path).split(".")[0].split("_")
+            self.deck_images[color] = (deck_path, stim_path(f"tokens_{letter}.png"))
+
+        super().__init__(log, practice, source, scale)
+
+    def build(self):
+        index   = self.log.index
+        screens = []
+        bank    = 0
+        pot     = 0
+
+        for i in range(len(self.log)):
+            if i > 0 and index["deck_number"][i] != index["deck_number"][i - 1]:
+                pot = 0
+
+            choice     = index["choice"][i]
+            deck_size  = int(index["risk"][i])
+            draws      = index["draw"][i] - (choice == 1)
+            deck_state = {"row": i, "pot": pot, "bank": bank, "cards_left": deck_size - draws,
+                          "deck_size": deck_size, "draws": draws}
+
+            screens.append(dict(deck_state, kind = "decision"))
+
+            if choice == 1:
+                screens.append(dict(deck_state, kind = "card", lost = bool(index["failed"][i])))
+                if index["failed"][i]:
+                    screens.append(dict(deck_state, kind = "summary", earnings = 0, lost = True))
+            elif choice == 0:
+                bank += pot
+                screens.append(dict(deck_state, kind = "summary", earnings = pot, bank = bank, lost = False))
+            else:
+                screens.append(dict(deck_state, kind = "timeout"))
+                screens.append(dict(deck_state, kind = "summary", earnings = 0, lost = True))
+
+            pot = index["pot"][i] or 0
+
+        screens.append({"row": None, "kind": "final", "bank": bank})
+        return screens
+
+    def draw_deck(self, row):
+        deck_image, token_image = self.deck_images[row["color"]]
+        self.renderer.image(deck_image, crcp_layout.DECK_SIZE, crcp_layout.DECK_POS, crcp_layout.DECK_ORI)
+        self.renderer.image(token_image, crcp_layout.TOKEN_SIZE, crcp_layout.TOKEN_POS)
+
+    def draw_value(self, screen, row):
+        """Value of the next draw shown on the decision screen."""
+        if row["failed"] and screen["deck_size"] in self.deck_values:
+            return self.deck_values[screen["deck_size"]][screen["draws"]]
+        return row["draw_value"]
+
+    def draw_decision(self, screen, row):
+        layout, text = crcp_layout, self.renderer.text
+        self.draw_deck(row)
+
+        text("Cards left:", (0, layout.DECISION_OFFSET), layout.COUNTER_SIZE, bold = True)
+        text("{:d}".format(screen["cards_left"]), (0, layout.DECISION_OFFSET-50), layout.COUNTER_SIZE,
+             layout.CHOICE_COLOR, True)
+
+        text("Draw value:", (layout.DECK_HOFFSET, -220), layout.DECISION_SIZE, bold = True)
+        text("{:.2f}".format(self.draw_value(screen, row)), (layout.DECK_HOFFSET, -270), layout.DECISION_SIZE,
+             layout.CHOICE_COLOR, True)
+        text("Press SPACE\nto draw a card", (layout.DECK_HOFFSET, -370), layout.CONTROL_SIZE)
+
+        text("Pot value:", (-layout.DECK_HOFFSET, -220), layout.DECISION_SIZE, bold = True)
+        text("{:.2f}".format(screen["pot"]), (-layout.DECK_HOFFSET, -270), layout.DECISION_SIZE,
+             layout.CHOICE_COLOR, True)
+        text("Press ENTER\nto collect pot", (-layout.DECK_HOFFSET, -370), layout.CONTROL_SIZE)
+
+    def draw_card(self, screen, row):
+        layout, text = crcp_layout, self.renderer.text
+        card_image = stim_path("nuke.png" if screen["lost"] else f"card_{row['card']}_*.png")
+
+        self.draw_deck(row)
+        self.renderer.image(card_image, layout.CARD_SIZE, layout.CARD_POS, layout.CARD_ORI)
+        if screen["lost"]:
+            text("YOU LOST THE POT!", (0, layout.DECISION_OFFSET), layout.COUNTER_SIZE, bold = True)
+        else:
+            text("Pot increased by", (0, layout.DECISION_OFFSET), layout.COUNTER_SIZE, bold = True)
+            text("{:.2f}".format(row["draw_value"]), (0, layout.DECISION_OFFSET-50), layout.COUNTER_SIZE,
+                 layout.CHOICE_COLOR, True)
+
+    def draw_timeout(self, screen, row):
+        layout = crcp_layout
+        self.renderer.text("You've waited too long!", (0, 50), layout.SUMMARY_SIZE)
+        self.renderer.text("You LOST the pot", (0, -50), layout.SUMMARY_SIZE, layout.LOST_COLOR, True)
+
+    def draw_summary(self, screen, row):
+        layout, text = crcp_layout, self.renderer.text
+        bank_color   = layout.LOST_COLOR if screen["lost"] else layout.SUMMARY_COLOR
+
+        self.renderer.image(stim_path("bank.png"), layout.BANK_SIZE, layout.BANK_POS)
+        text("Collected:", (layout.DECK_HOFFSET + 150, 250), layout.SUMMARY_SIZE, bold = True)
+        text("{:.2f}".format(screen["earnings"]), (layout.DECK_HOFFSET + 150, 180), layout.SUMMARY_SIZE,
+             bank_color, True)
+        text("Total:", (-layout.DECK_HOFFSET - 150, 250), layout.SUMMARY_SIZE, bold = True)
+        text("{:.2f}".format(screen["bank"]), (-layout.DECK_HOFFSET - 150, 180), layout.SUMMARY_SIZE,
+             layout.EARNINGS_COLOR, True)
+
+        if row["deck_number"] in CRCP_BREAKS:
+            text("You can take a break now", (0, -220), layout.SUMMARY_SIZE)
+            text("Press ENTER\nto continue", (0, -350), layout.SUMMARY_SIZE)
+
+    def draw_final(self, screen, row):
+        layout, text = crcp_layout, self.renderer.text
+        if self.practice:
+            text("End of the Practice Round", (0, 100), layout.SUMMARY_SIZE, bold = True)
+            text("Please notify the experimenter", (0, 0), layout.SUMMARY_SIZE, bold = True)
+        else:
+            text("Well done! You banked a total of", (0, 100), layout.SUMMARY_SIZE, bold = True)
+            text("{:.2f} points".format(screen["bank"]), (0, 0), layout.SUMMARY_SIZE, layout.EARNINGS_COLOR, True)
+            text("Thank you for your participation!", (0, -100), layout.SUMMARY_SIZE, bold = True)
+
+
+class PsapReplay(Replay):
+    """Incident, decision, pressing, outcome and final screens of a PSAP session."""
+
+    layout        = psap_layout
+    index_columns = ("condition", "choice", "n_incidents", "action_01", "action_02", "action_03")
+
+    def build(self):
+        index   = self.log.index
+        screens = []
+        score   = 0
+        n_prev  = 0
+
+        for i in range(len(self.log)):
+            condition = index["condition"][i]
+            actions   = [index["action_01"][i], index["action_02"][i], index["action_03"][i]]
+
+            # Adverse events since the previous trial, in the order they happened
+            for incident_counter in range(n_prev + 1, index["n_incidents"][i] + 1):
+                kind  = incident_kind(condition, self.practice, incident_counter)
+                screens.append({"row": i, "kind": "incident", "incident": kind, "score_before": score,
+                                "score": apply_incident(kind, score)})
+                score = screens[-1]["score"]
+            n_prev = index["n_incidents"][i]
+
+            button = PSAP_KEYS.index(index["choice"][i])
+            action = actions[button]
+            screens.append({"row": i, "kind": "decision", "score": score, "actions": actions})
+            screens.append({"row": i, "kind": "pressing", "score": score, "actions": actions, "button": button,
+                            "count": press_threshold(action) - 1})
+
+            if action == "Earn":
+                score += 1
+            screens.append({"row": i, "kind": "outcome", "score": score, "actions": actions, "button": button})
+
+        screens.append({"row": None, "kind": "final", "score": score})
+        return screens
+
+    def opponent_name(self, row):
+        return "PRACTICE" if self.practice else int(row["id"]) + 2
+
+    def draw_score(self, score, color = "White", bold = False):
+        layout = psap_layout
+        self.renderer.text("Score:", layout.SCORE_POS, layout.SCORE_SIZE)
+        self.renderer.text(f"{score:.2f}", layout.COUNT_POS, layout.SCORE_SIZE, color, bold)
+
+    def draw_button(self, screen, row, button):
+        layout = psap_layout
+        color  = row[f"color_0{button + 1}"]
+        self.renderer.image(stim_path(f"button_{color}.png"), layout.BUTTON_SIZE, layout.BUTTON_POS[button])
+        self.renderer.text(f"Press {PSAP_KEY_NAMES[button]} to {screen['actions'][button]}", layout.CTRL_POS[button],
+                           layout.CONTROL_SIZE, wrap_width = layout.BUTTON_SIZE[0])
+
+    def draw_decision(self, screen, row):
+        self.draw_score(screen["score"])
+        for button in range(len(screen["actions"])):
+            self.draw_button(screen, row, button)
+
+    def draw_pressing(self, screen, row):
+        layout = psap_layout
+        x, y   = layout.BUTTON_POS[screen["button"]]
+
+        self.draw_score(screen["score"])
+        self.draw_button(screen, row, screen["button"])
+        self.renderer.text("Key presses:", (x - 25, y + 180), layout.N_KEY_SIZE)
+        self.renderer.text(f"{screen['count']}", (x + 150, y + 180), layout.N_KEY_SIZE)
+
+    def draw_outcome(self, screen, row):
+        layout = psap_layout
+        action = screen["actions"][screen["button"]]
+
+        if action == "Earn":
+            message, color = "You earned 1 point!", layout.EARNINGS_COLOR
+        elif action == "Protect":
+            message, color = "Your points are protected\nfor some time", layout.SHIELDED_COLOR
+            self.renderer.image(stim_path("shield.png"), layout.STATUS_SIZE, layout.STATUS_POS)
+        else:
+            message, color = "You deducted 1 point\nfrom your opponent!", layout.SUMMARY_COLOR
+
+        # A deduction leaves the score as it was on the decision screen
+        self.draw_score(screen["score"], *((color, True) if action != "Deduct" else ()))
+        self.renderer.text(message, layout.MESSAGE_POS, layout.SUMMARY_SIZE, color, wrap_width = 1500)
+
+    def draw_incident(self, screen, row):
+        layout = psap_layout
+        if screen["incident"] == "steal":
+            player  = "Participant" if self.practice else "Player"
+            message = f"{player} {self.opponent_name(row)}\nstole from you!"
+        else:
+            message = f"System Error! You lost {screen['score_before']/2:.2f} points"
+
+        # Outside practice, the icon is the one of the condition's incident
+        icon = screen["incident"] if self.practice else ("steal" if row["condition"] == "A" else "glitch")
+        self.renderer.image(stim_path(f"{icon}.png"), layout.STATUS_SIZE, layout.STATUS_POS)
+        self.draw_score(screen["score"], layout.LOST_COLOR, True)
+        self.renderer.text(message, layout.MESSAGE_POS, layout.SUMMARY_SIZE, layout.LOST_COLOR, wrap_width = 1500)
+
+    def draw_final(self, screen, row):
+        layout, text = psap_layout, self.renderer.text
+        if self.practice:
+            text("End of the Practice Round", (0, 100), layout.SUMMARY_SIZE, wrap_width = 1500)
+            text("Please notify the experimenter", (0, 0), layout.SUMMARY_SIZE, wrap_width = 1500)
+        else:
+            text("This is the end of this task", (0, 100), layout.SUMMARY_SIZE, wrap_width = 1500)
+            text(f"Total Score: {screen['score']:.2f}", (0, 0), layout.SUMMARY_SIZE, layout.SUMMARY_COLOR,
+                 wrap_width = 1500)
+            text("Thank you for participanting!", (0, -100), layout.SUMMARY_SIZE, wrap_width = 1500)
+
+
+REPLAYS = {"crcp": CrcpReplay, "psap": PsapReplay}
+
+
+def open_replay(path, practice = None, source = "atlas", scale = 1):
+    """Replay of a session log; practice runs are told apart by their data/tests folder."""
+    with open(path) as log_file:
+        columns = [column.strip() for column in log_file.readline().split(",")]
+    replay_class = REPLAYS[detect_task(columns)]
+
+    if practice is None:
+        practice = os.path.dirname(os.path.abspath(path)) == DIR_TEST
+    log = SessionLog(path, replay_class.index_columns)
+    return replay_class(log, practice, source, scale)
+
+
+def write_frames(replay, out_dir, screens):
+    os.makedirs(out_dir, exist_ok = True)
+    for i in screens:
+        replay.render(i).save(os.path.join(out_dir, f"screen_{i + 1:05d}_{replay.screens[i]['kind']}.png"))
+
+
+def write_video(replay, path, screens, fps = 30, hold = 30):
+    """Write the screens as a video, each held for hold frames. Needs imageio (and imageio-ffmpeg for mp4)."""
+    try:
+        import imageio.v2 as imageio
+        import numpy as np
+    except ImportError:
+        print(f"WARNING: imageio is not installed, {path} was not written. Use --frames to write PNG images")
+        return False
+
+    with imageio.get_writer(path, fps = fps) as writer:
+        for i in screens:
+            frame = np.asarray(replay.render(i))
+            for _ in range(hold):
+                writer.append_data(frame)
+    return True
+
+
+def view(replay, start = 0):
+    """Step through the screens in a window: left/right to step, up/down to jump trials, escape to quit."""
+    from psychopy import event, visual
+
+    win = visual.Window(
+        size    = replay.renderer.size,
+        units   = "pix",
+        color   = replay.layout.WIN_COLOR,
+        fullscr = False
+    )
+    screen = visual.ImageStim(win, size = replay.renderer.size)
+
+    i = start
+    while True:
+        screen.image = replay.render(i)
+        screen.draw()
+        win.flip()
+        print(replay.describe(i))
+
+        key = event.waitKeys(keyList = list(VIEW_KEYS) + ["up", "down", "home", "end", "escape"])[0]
+        if key == "escape":
+            break
+        elif key in VIEW_KEYS:
+            i = min(max(i + VIEW_KEYS[key], 0), len(replay) - 1)
+        elif key in ("up", "down"):
+            i = replay.trial_start(i, 1 if key == "down" else -1)
+        else:
+            i = 0 if key == "home" else len(replay) - 1
+
+    win.close()
+
+
+def parse_screens(spec, n_screens):
+    """Screen indices of a 1-based start:stop range (stop included)."""
+    if not spec:
+        return range(n_screens)
+    start, _, stop = spec.partition(":")
+    return range(max(int(start or 1) - 1, 0), min(int(stop) if stop else n_screens, n_screens))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Replay the screens of a CRCP or PSAP session log")
+    parser.add_argument("log", help = "session csv log")
+    parser.add_argument("--frames", help = "write every screen as a PNG image in this directory")
+    parser.add_argument("--video", help = "write the screens as a video (needs imageio)")
+    parser.add_argument("--interactive", action = "store_true", help = "step through the screens in a window")
+    parser.add_argument("--screens", help = "1-based range of screens, start:stop")
+    parser.add_argument("--trial", type = int, help = "start at this row of the log (1-based)")
+    parser.add_argument("--practice", action = "store_true", default = None, help = "the log is from a practice run")
+    parser.add_argument("--scale", type = float, default = 1, help = "scale of the written images")
+    parser.add_argument("--fps", type = int, default = 30)
+    parser.add_argument("--hold", type = int, default = 30, help = "video frames per screen")
+    parser.add_argument("--source", default = "atlas", choices = ["atlas", "files"], help = "stimulus image source")
+    args = parser.parse_args()
+
+    replay  = open_replay(args.log, args.practice, args.source, args.scale)
+    screens = parse_screens(args.screens, len(replay))
+    if args.trial:
+        screens = range(replay.row_starts[min(args.trial, len(replay.row_starts)) - 1], screens.stop)
+
+    print(f"{replay.log.task.upper()} log with {len(replay.log)} rows, {len(replay)} screens")
+    if args.frames:
+        write_frames(replay, args.frames, screens)
+    if args.video:
+        write_video(replay, args.video, screens, args.fps, args.hold)
+    if args.interactive:
+        view(replay, screens.start)
+    if not (args.frames or args.video or args.interactive):
+        for i in screens:
+            print(replay.describe(i))
@@ -0,0 +1,85 @@
+# Indexed session log reader
+# Random access to the rows of a CRCP or PSAP csv log. The file is scanned
+# once to record the byte offset of every row, plus the values of a few index
+# columns; any row is then read by seeking to its offset, so jumping back and
+# forth through a long session never re-reads or re-parses the whole file.
+#
+# Values are converted with the column types of session_schema.py (sentinels
+# such as 99 or "none" become None). Columns a log predates, such as
+# t_incident_due in older PSAP logs, read as None.
+
+from helpers import session_schema
+
+# A column only one of the tasks logs
+TASK_COLUMNS = {"deck_number": "crcp", "n_incidents": "psap"}
+
+
+def detect_task(columns):
+    """Task ("crcp" or "psap") that wrote a log with these columns."""
+    for column, task in TASK_COLUMNS.items():
+        if column in columns:
+            return task
+    raise ValueError(f"Not a CRCP or PSAP log, columns: {', '.join(columns)}")
+
+
+class SessionLog:
+    """Rows of a session csv log, read on demand through a byte-offset index."""
+
+    def __init__(self, path, index_columns = ()):
+        self.path = path
+        self._file = open(path, "rb")
+
+        header       = self._file.readline()
+        self.columns = [column.strip() for column in header.decode().split(",")]
+        self.task    = detect_task(self.columns)
+        self.schema  = {name: (kind, nulls) for name, kind, nulls in session_schema.SCHEMAS[self.task]}
+
+        self.offsets = []
+        self.index   = {column: [] for column in index_columns}
+        positions    = [(column, self.columns.index(column)) for column in index_columns if column in self.columns]
+
+        offset = len(header)
+        for line in self._file:
+            if line.strip():
+                self.offsets.append(offset)
+                if positions:
+                    fields = line.decode().split(",")
+                    for column, position in positions:
+                        self.index[column].append(self._convert(column, fields[position]))
+            offset += len(line)
+
+        for column in index_columns:
+            if column not in self.columns:
+                self.index[column] = [None] * len(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _convert(self, column, value):
+        kind, nulls = self.schema.get(column, ("string", ()))
+        return session_schema.convert(kind, value, nulls)
+
+    def row(self, i):
+        """Row i as a dict of converted values."""
+        self._file.seek(self.offsets[i])
+        fields = self._file.readline().decode().rstrip("\r\n").split(",")
+        row = {column: None for column in self.schema}
+        row.update({column: self._convert(column, value) for column, value in zip(self.columns, fields)})
+        return row
+
+    def find(self, column, value, start = 0):
+        """First row at or after start whose index column equals value, or None."""
+        values = self.index[column]
+        for i in range(start, len(values)):
+            if values[i] == value:
+                return i
+        return None
+
+    def close(self):
+        self._file.close()
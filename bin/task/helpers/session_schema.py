@@ -0,0 +1,151 @@
+# Session data schema
+# Column types for the trial logs written by CRCP and PSAP, used to write
+# typed columnar session files (Parquet or Arrow IPC) next to the csv logs.
+# The csv files stringify everything and mix sentinels into numeric columns
+# (99 for invalid responses, "none" for no card, 0 for a missing stop time),
+# so every column declares which values mean "missing".
+#
+# Bump SCHEMA_VERSION whenever a column is added, removed or retyped.
+
+import ast
+import os
+
+SCHEMA_VERSION = 4
+
+# Column kinds: string, category, int, float, bool, key (first key of a
+# waitKeys response, stored as a category), floats (a sequence of times,
+# logged as space-separated text by pack_times() and stored as a list)
+# CRCP sessions logged before schema version 4 have no hazard column: they
+# ran the "baseline" bad-card hazard of helpers/crcp_engine.py
+CRCP_SCHEMA = [
+    ("id",          "string",   ()),
+    ("deck_number", "int",      ()),
+    ("deck_id",     "int",      ()),
+    ("risk",        "category", ()),
+    ("color",       "category", ()),
+    ("card",        "category", ("none",)),
+    ("draw_value",  "float",    ()),
+    ("pot",         "float",    ()),
+    ("draw",        "int",      ()),
+    ("choice",      "int",      (99,)),
+    ("failed",      "bool",     (99,)),
+    ("start",       "float",    ()),
+    ("end",         "float",    (0,)),
+    ("key_time",    "float",    (0,)),
+    ("rt",          "float",    (99,)),
+    ("hazard",      "category", ())
+]
+
+PSAP_SCHEMA = [
+    ("id",              "string",   ()),
+    ("condition",       "category", ()),
+    ("color_01",        "category", ()),
+    ("color_02",        "category", ()),
+    ("color_03",        "category", ()),
+    ("action_01",       "category", ()),
+    ("action_02",       "category", ()),
+    ("action_03",       "category", ()),
+    ("choice",          "key",      ()),
+    ("n_incidents",     "int",      ()),
+    ("t_last_incident", "float",    ()),
+    ("t_incident_due",  "float",    ()),
+    ("start",           "float",    ()),
+    ("end",             "float",    ()),
+    ("rt",              "float",    ()),
+    ("press_times",     "floats",   ())
+]
+
+SCHEMAS = {"crcp": CRCP_SCHEMA, "psap": PSAP_SCHEMA}
+
+TYPED_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def pack_times(times, origin = 0.0):
+    """Times relative to origin as the text logged in a floats column (0.1 ms resolution)."""
+    return " ".join(f"{time - origin:.4f}" for time in times)
+
+
+def convert(kind, value, nulls = ()):
+    """Convert a logged value, or its csv text, to the column's Python type."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+
+    for null in nulls:
+        if value == null or (isinstance(value, str) and value == str(null)):
+            return None
+
+    if kind == "int":
+        return int(float(value))
+    if kind == "float":
+        return float(value)
+    if kind == "bool":
+        if isinstance(value, str):
+            return value == "True"
+        return bool(value)
+    if kind == "key":
+        if isinstance(value, str) and value.startswith("["):
+            value = ast.literal_eval(value)
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        return value
+    if kind == "floats":
+        if isinstance(value, str):
+            value = value.split()
+        return [float(time) for time in value]
+    return str(value)
+
+
+def arrow_type(kind):
+    """Arrow type used to store a column kind."""
+    import pyarrow as pa
+
+    return {"string":   pa.string(),
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "key":      pa.dictionary(pa.int32(), pa.string()),
+            "int":      pa.int64(),
+            "float":    pa.float64(),
+            "bool":     pa.bool_(),
+            "floats":   pa.list_(pa.float64())}[kind]
+
+
+def to_arrow(schema, columns, task):
+    """Build a typed Arrow table from raw logged columns (name -> list of values)."""
+    import pyarrow as pa
+
+    arrays, fields = [], []
+    for name, kind, nulls in schema:
+        values = [convert(kind, value, nulls) for value in columns[name]]
+        if kind in ("category", "key"):
+            values = [None if value is None else str(value) for value in values]
+            array  = pa.array(values, type = pa.string()).dictionary_encode()
+            array  = array.cast(arrow_type(kind))
+        else:
+            array = pa.array(values, type = arrow_type(kind))
+        arrays.append(array)
+        fields.append(pa.field(name, arrow_type(kind)))
+
+    metadata = {"schema_version": str(SCHEMA_VERSION), "task": task}
+    return pa.Table.from_arrays(arrays, schema = pa.schema(fields, metadata = metadata))
+
+
+def write_typed(table, path, file_format = "parquet"):
+    """Write a typed session table as Parquet or Arrow IPC."""
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+
+    elif file_format == "arrow":
+        import pyarrow as pa
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    else:
+        raise ValueError(f"Unknown typed session format: {file_format}")
+
+
+def typed_path(csv_path, file_format):
+    """Typed session file that sits next to a csv log."""
+    return os.path.splitext(csv_path)[0] + TYPED_EXTENSIONS[file_format]
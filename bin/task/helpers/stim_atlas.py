@@ -0,0 +1,185 @@
+# Stimulus texture atlases
+# Offline build step that packs the print-resolution PNGs in figures/stim into
+# a few display-sized atlases plus a JSON index of sub-rectangles, and the
+# decoder the tasks use to read stimuli back out of them.
+#
+# At run time each atlas sheet is read and decoded once, on first use, and
+# every stimulus is cropped out of the decoded sheet. Stimuli still get a
+# texture of their own (ImageStim has no sub-rectangle texture coordinates),
+# so the atlases reduce the file reads and the decode size, not the number
+# of textures.
+#
+# Build (from the repository root):
+#     python bin/task/helpers/stim_atlas.py
+#
+# The display sizes below mirror the *_SIZE settings in CRCP.py and psap.py.
+# Images used at more than one size are packed at the largest one.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+
+from PIL import Image
+
+# Allow running this file directly as the build command
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.stim_cache import decode_image
+
+DIR_BASE  = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+DIR_STIM  = os.path.join(DIR_BASE, "figures", "stim")
+DIR_ATLAS = os.path.join(DIR_BASE, "figures", "atlas")
+
+ATLAS_INDEX   = os.path.join(DIR_ATLAS, "index.json")
+ATLAS_VERSION = 1
+
+ATLAS_WIDTH = 2048
+PADDING     = 2
+
+# atlas name -> list of (file pattern, display size in pix)
+ATLAS_GROUPS = {
+    "cards": [("card*.png", (250, 357)),
+              ("nuke.png",  (250, 357))],
+    "decks": [("deck*.png",   (250, 357)),
+              ("back*.png",   (250, 357)),
+              ("tokens*.png", (242.5, 300)),
+              ("bank.png",    (270, 275))],
+    "ui":    [("button*.png",        (250, 250)),
+              ("avatar*.png",        (300, 300)),
+              ("player_profile.png", (300, 300)),
+              ("shield.png",         (100, 90)),
+              ("steal.png",          (100, 90)),
+              ("glitch.png",         (100, 90))]
+}
+
+
+def pack_shelves(sizes, max_width = ATLAS_WIDTH, padding = PADDING):
+    """Shelf-pack rectangles, tallest first. Returns positions and atlas size."""
+    order = sorted(range(len(sizes)), key = lambda i: sizes[i][1], reverse = True)
+    positions = [None] * len(sizes)
+
+    x = y = shelf_height = atlas_width = 0
+    for i in order:
+        width, height = sizes[i]
+        if x + width > max_width and x > 0:
+            y += shelf_height + padding
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+        atlas_width  = max(atlas_width, x - padding)
+
+    return positions, (atlas_width, y + shelf_height)
+
+
+def build_atlases(dir_stim = DIR_STIM, dir_out = DIR_ATLAS):
+    """Downscale every stimulus image and write the atlases plus index.json."""
+    os.makedirs(dir_out, exist_ok = True)
+    index = {"version": ATLAS_VERSION, "atlases": {}, "images": {}}
+
+    for atlas_name, patterns in ATLAS_GROUPS.items():
+        paths, sizes = [], []
+        for pattern, size in patterns:
+            for path in sorted(glob.glob(os.path.join(dir_stim, pattern))):
+                paths.append(path)
+                sizes.append((int(round(size[0])), int(round(size[1]))))
+
+        positions, atlas_size = pack_shelves(sizes)
+        atlas = Image.new("RGBA", atlas_size, (0, 0, 0, 0))
+
+        for path, size, (x, y) in zip(paths, sizes, positions):
+            atlas.paste(decode_image(path, size), (x, y))
+            index["images"][os.path.basename(path)] = {"atlas": atlas_name,
+                                                       "rect":  [x, y, size[0], size[1]]}
+
+        atlas_file = atlas_name + ".png"
+        atlas.save(os.path.join(dir_out, atlas_file), optimize = True)
+        index["atlases"][atlas_name] = atlas_file
+        print(f"{atlas_name}: {len(paths)} images, {atlas_size[0]}x{atlas_size[1]}")
+
+    with open(os.path.join(dir_out, "index.json"), "w") as index_file:
+        json.dump(index, index_file, indent = 1)
+
+    return index
+
+
+class Atlas:
+    """Reads stimulus images as sub-rectangles of the prebuilt atlases.
+
+    Sheets are decoded once and shared by every image on them, also when
+    images are decoded from several prefetch threads at once.
+    """
+
+    def __init__(self, index_path = ATLAS_INDEX):
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+
+        if index.get("version") != ATLAS_VERSION:
+            raise ValueError(f"Unsupported atlas version in {index_path}, rebuild the atlases")
+
+        self.dir     = os.path.dirname(index_path)
+        self.files   = index["atlases"]
+        self.images  = index["images"]
+        self._sheets = {}
+        self._lock   = threading.Lock()
+
+    def __contains__(self, path):
+        return os.path.basename(path) in self.images
+
+    def sheet(self, atlas_name):
+        """Decoded atlas sheet, read from its file on first use."""
+        with self._lock:
+            sheet = self._sheets.get(atlas_name)
+            if sheet is None:
+                sheet = Image.open(os.path.join(self.dir, self.files[atlas_name]))
+                sheet.load()
+                self._sheets[atlas_name] = sheet
+        return sheet
+
+    def decode(self, path, size):
+        """Return the image for path at the requested display size."""
+        entry = self.images[os.path.basename(path)]
+        sheet = self.sheet(entry["atlas"])
+
+        x, y, width, height = entry["rect"]
+        image = sheet.crop((x, y, x + width, y + height))
+        target = (int(round(size[0])), int(round(size[1])))
+        if image.size != target:
+            image = image.resize(target, Image.LANCZOS)
+        return image
+
+
+def stim_decoder(source = "atlas", index_path = ATLAS_INDEX):
+    """Image decoder for the requested source ("atlas" or "files").
+
+    Falls back to decoding the original files when the atlases have not been
+    built yet, so a fresh checkout still runs.
+    """
+    if source == "atlas":
+        if os.path.exists(index_path):
+            atlas = Atlas(index_path)
+
+            def decode(path, size):
+                if path in atlas:
+                    return atlas.decode(path, size)
+                return decode_image(path, size)
+
+            return decode
+
+        print(f"WARNING: no stimulus atlas at {index_path}, loading images from files. "
+              "Run bin/task/helpers/stim_atlas.py to build it.")
+
+    return decode_image
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build display-sized stimulus atlases")
+    parser.add_argument("--stim", default = DIR_STIM, help = "directory with the source PNGs")
+    parser.add_argument("--out", default = DIR_ATLAS, help = "output directory for atlases and index.json")
+    args = parser.parse_args()
+
+    build_atlases(args.stim, args.out)
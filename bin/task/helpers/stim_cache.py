@@ -0,0 +1,132 @@
+# Texture cache for image stimuli
+# The stimulus PNGs are stored at print resolution (up to 2456x3508) but are
+# drawn at a few hundred pixels. Decoding them on every draw stalls the frame
+# loop, so images are decoded once, downsampled to their on-screen size and
+# kept as ready-to-draw ImageStims keyed by path.
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from PIL import Image
+
+BYTES_PER_PIXEL = 4  # RGBA textures
+
+
+def decode_image(path, size):
+    """Decode an image file and downsample it to its on-screen size (pix units)."""
+    width, height = int(round(size[0])), int(round(size[1]))
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+        return image.resize((width, height), Image.LANCZOS, reducing_gap = 3.0)
+
+
+class TextureCache:
+    """Display-resolution ImageStims keyed by image path, with LRU eviction.
+
+    Every path is registered with the stimulus settings it is drawn with
+    (size, pos, ori...). Evicted entries are decoded again on the next
+    request, so the budget only bounds memory, never correctness. The decode
+    callable takes (path, size) and defaults to reading the original file.
+
+    prefetch() decodes images on worker threads while the task is idle; the
+    OpenGL texture itself is still created on the drawing thread in get().
+    """
+
+    def __init__(self, win, budget_mb = 128, decode = decode_image, prefetch_workers = 2):
+        self.win    = win
+        self.decode = decode
+        self.budget = budget_mb * 1024 * 1024
+        self.used   = 0
+
+        # hits: already built, prefetched: decoded in the background in time,
+        # misses: decoded on the drawing thread when requested
+        self.hits       = 0
+        self.prefetched = 0
+        self.misses     = 0
+
+        self._settings = {}
+        self._stims    = OrderedDict()
+        self._pending  = {}
+        self._lock     = threading.Lock()
+        self._workers  = prefetch_workers
+        self._executor = None
+
+    def register(self, paths, size, **stim_kwargs):
+        """Declare how the images in paths are drawn, without decoding them."""
+        for path in paths:
+            self._settings[path] = dict(stim_kwargs, size = size)
+
+    def preload(self, paths, size, **stim_kwargs):
+        """Register, decode and build the stims for paths up front."""
+        self.register(paths, size, **stim_kwargs)
+        for path in paths:
+            if path not in self._stims:
+                self._insert(path, self.decode(path, size))
+
+    def get(self, path):
+        """Return the cached ImageStim for path, decoding it on a miss."""
+        with self._lock:
+            entry = self._stims.get(path)
+            if entry is not None:
+                self._stims.move_to_end(path)
+                self.hits += 1
+                return entry[0]
+
+        future = self._pending.pop(path, None)
+        if future is not None:
+            if future.done():
+                self.prefetched += 1
+            else:
+                self.misses += 1
+            return self._insert(path, future.result())
+
+        self.misses += 1
+        return self._insert(path, self.decode(path, self._settings[path]["size"]))
+
+    def prefetch(self, paths):
+        """Start decoding the given paths in the background if they are not ready."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers = self._workers,
+                                                thread_name_prefix = "prefetch")
+        for path in paths:
+            if path in self._stims or path in self._pending:
+                continue
+            self._pending[path] = self._executor.submit(self.decode, path, self._settings[path]["size"])
+
+    def stats(self):
+        """Counts of requests served from cache, from prefetch, and decoded on demand."""
+        return {"hits": self.hits, "prefetched": self.prefetched, "misses": self.misses}
+
+    def close(self):
+        """Stop the prefetch workers."""
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait = False)
+            self._executor = None
+
+    def __contains__(self, path):
+        return path in self._stims
+
+    def _insert(self, path, image):
+        """Build the stim for a decoded image and evict old entries over budget."""
+        # Imported here so the decoding half of this module stays usable without a window
+        from psychopy import visual
+
+        stim   = visual.ImageStim(self.win, image = image, **self._settings[path])
+        nbytes = image.size[0] * image.size[1] * BYTES_PER_PIXEL
+
+        with self._lock:
+            if path in self._stims:
+                self.used -= self._stims.pop(path)[1]
+            self._stims[path] = (stim, nbytes)
+            self.used += nbytes
+
+            while self.used > self.budget and len(self._stims) > 1:
+                _, (_, evicted_bytes) = self._stims.popitem(last = False)
+                self.used -= evicted_bytes
+
+        return stim
@@ -0,0 +1,51 @@
+# Text stim pool
+# Laying out a TextStim (building its glyphs) happens every time its text or
+# style changes, so reusing one shared stim for every label on a screen lays
+# out every label again on every frame. The pool keeps one stim per text
+# field (template stim, position, alignment and weight) and only updates it
+# when its text or color differs from what it already shows: static labels
+# are laid out once per session, numeric fields only when their value changes.
+# Screens that show other text at the same place give their fields a name
+# (screen), so alternating between them does not lay the labels out again.
+
+
+class TextPool:
+    """Dedicated TextStims per text field, created from template stims on first use."""
+
+    def __init__(self, win, wrap_width = 1000):
+        self.win        = win
+        self.wrap_width = wrap_width
+        self._stims     = {}
+        self._shown     = {}
+
+    def get(self, template, pos, alignment = "right", bold = False, screen = None):
+        """The pooled stim for a text field, created with the template's font and size."""
+        key = (id(template), tuple(pos), alignment, bold, screen)
+        stim = self._stims.get(key)
+        if stim is None:
+            from psychopy import visual
+
+            stim = visual.TextStim(
+                self.win,
+                font      = template.font,
+                height    = template.height,
+                units     = template.units,
+                pos       = pos,
+                alignText = alignment,
+                bold      = bold,
+                wrapWidth = self.wrap_width
+            )
+            self._stims[key] = stim
+            self._shown[key] = (None, None)
+        return key, stim
+
+    def draw(self, template, pos, txt, alignment = "right", bold = False, color = "white", screen = None):
+        """Draw txt in a text field; same arguments as CRCP.drawText(), plus the field's screen."""
+        key, stim = self.get(template, pos, alignment, bold, screen)
+        text, shown_color = self._shown[key]
+        if color != shown_color:
+            stim.color = color
+        if txt != text:
+            stim.setText(txt)
+        self._shown[key] = (txt, color)
+        stim.draw()
@@ -0,0 +1,99 @@
+# Buffered trial logger
+# Trial rows are appended to an in-memory columnar buffer on the drawing
+# thread and written to the csv file by a background thread, so disk latency
+# never lands between a key press and the next flip. sync() forces the rows
+# to disk (flush + fsync) and is meant for break screens and task exit.
+#
+# Optionally, the whole session is also written as a typed Parquet or Arrow
+# file when the logger is closed (see session_schema.py). The csv file stays
+# the crash-safe record.
+
+import atexit
+import os
+import threading
+
+from helpers import session_schema
+
+
+class TrialLogger:
+    """Columnar trial buffer flushed to a csv file in the background."""
+
+    def __init__(self, path, columns, flush_interval = 5.0, task = None, typed_format = None):
+        self.path           = path
+        self.columns        = list(columns)
+        self.flush_interval = flush_interval
+        self.task           = task
+        self.typed_format   = typed_format
+
+        # Every flushed row is kept when a typed session file is requested
+        self._history = {column: [] for column in self.columns} if typed_format else None
+
+        self._buffer     = {column: [] for column in self.columns}
+        self._lock       = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop       = threading.Event()
+
+        self._file = open(path, "w")
+        self._file.write(", ".join(self.columns) + "\n")
+
+        self._thread = threading.Thread(target = self._run, name = "trial-logger", daemon = True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, **row):
+        """Append one row; every column must be given."""
+        with self._lock:
+            for column in self.columns:
+                self._buffer[column].append(row[column])
+
+    def flush(self):
+        """Write the buffered rows to the file."""
+        with self._lock:
+            buffer = self._buffer
+            self._buffer = {column: [] for column in self.columns}
+
+        columns = [buffer[column] for column in self.columns]
+        lines = [",".join(str(value) for value in row) + "\n" for row in zip(*columns)]
+
+        with self._write_lock:
+            if lines and not self._file.closed:
+                self._file.writelines(lines)
+                if self._history is not None:
+                    for column in self.columns:
+                        self._history[column].extend(buffer[column])
+
+    def sync(self):
+        """Write the buffered rows and make sure they reach the disk."""
+        self.flush()
+        with self._write_lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """Stop the background writer and sync every remaining row."""
+        if self._file.closed:
+            return
+        self._stop.set()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+        self.sync()
+        with self._write_lock:
+            self._file.close()
+        atexit.unregister(self.close)
+
+        if self.typed_format:
+            self.write_typed()
+
+    def write_typed(self):
+        """Write every logged row as a typed columnar session file."""
+        try:
+            table = session_schema.to_arrow(session_schema.SCHEMAS[self.task], self._history, self.task)
+        except ImportError:
+            print(f"WARNING: pyarrow is not installed, no {self.typed_format} file was written for {self.path}")
+            return
+        session_schema.write_typed(table, session_schema.typed_path(self.path, self.typed_format), self.typed_format)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -47,15 +47,14 @@
 # Steal icon: User1558154 - Freepik.com (Hacker with laptop - https://www.freepik.com/free-vector/hacker-with-laptop-hacker-attack-phishing-and-fraudvector-stock-illustration_34533105.htm)
 
 # IMPORT LIBRARIES
-from doctest import FAIL_FAST
+## Only what the setup dialog needs is imported before it is shown, so it
+## appears right away; the other libraries are imported once it returns
+## (profile with bin/bench/import_profile.py)
 import random
-from psychopy import core, event, gui, visual
+from psychopy import core, gui
 import datetime
 import os
 import glob
-import pandas as pd
-import numpy as np
-from tkinter import messagebox
 
 # BASE SETUP 
 ## Base paths
@@ -73,9 +72,20 @@ AVATAR_LIST = glob.glob(os.path.join(DIR_STIM, "avatar*.png"))
 
 SHIELD  = os.path.join(DIR_STIM, "shield.png")
 PROFILE = os.path.join(DIR_STIM, "player_profile.png")
+STEAL   = os.path.join(DIR_STIM, "steal.png")
+GLITCH  = os.path.join(DIR_STIM, "glitch.png")
+
+## Stimulus loading: "atlas" reads the prebuilt atlases in figures/atlas,
+## "files" decodes the original PNGs
+STIM_SOURCE = "atlas"
 
 ## Timing
-clock = core.monotonicClock
+## The main loop polls the keyboard and timers every POLL_INTERVAL seconds
+## and only flips the window when the screen changes
+## Timers and key presses are on the task clock, reset when the main task starts
+task_clock = core.Clock()
+
+POLL_INTERVAL = 0.001
 
 ## Dialog to enter experiment information
 exp_info = {"experiment_name":"AIDM-PSAP",
@@ -109,9 +119,28 @@ while True:
 
     except ValueError:
         print("ERROR: Only use numbers for the Participant ID")
+        from tkinter import messagebox
         messagebox.showerror("ERROR:", "Only use numbers for the Participant ID")
         core.quit()
 
+## Task libraries
+import time
+from psychopy import event, logging, visual
+
+from helpers.avatar_grid import AvatarGrid
+from helpers.frame_timing import FrameTimer, routine, set_routine
+from helpers.key_input import open_key_input
+from helpers.psap_engine import (EventScheduler, adverse_threshold, apply_incident, first_shield_threshold,
+                                 incident_kind, next_shield_threshold, press_threshold)
+from helpers.psap_engine import outcome_interval as display_interval
+from helpers.psap_layout import (AVATAR_POS, AVATAR_SIZE, BUTTON_POS, BUTTON_SIZE, CONTROL_SIZE, COUNT_POS, CTRL_POS,
+                                 EARNINGS_COLOR, KEY_POS, LOST_COLOR, MESSAGE_POS, N_KEY_POS, N_KEY_SIZE,
+                                 PROFILE_SIZE, SCORE_POS, SCORE_SIZE, SHIELDED_COLOR, STATUS_POS, STATUS_SIZE,
+                                 SUMMARY_COLOR, SUMMARY_SIZE, WIN_COLOR, WIN_HEIGHT, WIN_WIDTH)
+from helpers.session_schema import pack_times
+from helpers.stim_atlas import stim_decoder
+from helpers.trial_logger import TrialLogger
+
 ## Define behavior for practice and normal runs
 PLAYER_NAME = int(exp_info["participant_id"])
 
@@ -126,20 +155,18 @@ elif test_run == False:
     OPPONENT_NAME = int(exp_info["participant_id"]) + 2
 
 if condition == "A":
-    INCIDENT = os.path.join(DIR_STIM, "steal.png")
+    INCIDENT = STEAL
     
 else:
-    INCIDENT = os.path.join(DIR_STIM, "glitch.png")
+    INCIDENT = GLITCH
 
 # BASE STIM SETUP
-## Window settings
-WIN_WIDTH  = 1920
-WIN_HEIGHT = 1080
-
+## Window, stimulus and text settings are in helpers/psap_layout.py, shared
+## with the session replay
 win = visual.Window(
     size    = (WIN_WIDTH, WIN_HEIGHT),
     units   = "pix",
-    color   = "#666666",
+    color   = WIN_COLOR,
     fullscr = False
 )
 
@@ -153,6 +180,12 @@ KEY_QUIT      = "escape"
 ACTION_LIST   = ["Earn", "Deduct", "Protect"]
 KEY_NEXT      = "return"
 
+## Keyboard backend: "ptb" (psychtoolbox key queue, hardware timestamps),
+## "event" (window event loop, frame accuracy) or "fake" (simulated presses)
+KEY_BACKEND = "ptb"
+
+keyboard = open_key_input(KEY_BACKEND, task_clock)
+
 ## Randomly assign buttons and icons to actions
 random.shuffle(ACTION_LIST)
 random.shuffle(BUTTON_LIST)
@@ -162,59 +195,56 @@ MSG_LIST = [f"Press {KEY_NAME_LIST[0]} to {ACTION_LIST[0]}",
             f"Press {KEY_NAME_LIST[2]} to {ACTION_LIST[2]}"]
 
 ## Define and initialize csv file to dump data
-PSAP_FILE = os.path.join(DIR_DATA, "%s-%s-%s-%s" % ("psap", exp_info["participant_id"], condition, exp_info["date_time"]) + ".csv")
-psap_log = open(PSAP_FILE, "w")
-psap_log.write("id, condition, color_01, color_02, color_03, action_01, action_02, action_03, choice, n_incidents, t_last_incident, start, end\n")
+## Rows are buffered and written in the background every LOG_FLUSH_INTERVAL seconds,
+## and synced to disk at the end of the task
+## TYPED_FORMAT ("parquet", "arrow" or None) also writes a typed session file at the end
+## Times are on the task clock: start is the flip that showed the decision screen, end
+## the press that completed the action, rt the first press after start (not counting the
+## time incidents paused the decision screen) and press_times every counted press of the
+## action, relative to start
+LOG_FLUSH_INTERVAL = 5
+TYPED_FORMAT       = None
+LOG_COLUMNS        = ["id", "condition", "color_01", "color_02", "color_03", "action_01", "action_02",
+                      "action_03", "choice", "n_incidents", "t_last_incident", "t_incident_due", "start", "end",
+                      "rt", "press_times"]
 
-## Text settings
-CONTROL_SIZE = 50
-SCORE_SIZE   = 60
-N_KEY_SIZE   = 50
-SUMMARY_SIZE = 80
-
-SHIELDED_COLOR = "#93FAEE"
-LOST_COLOR     = "#FFA6A3"
-EARNINGS_COLOR = "#ABFF94"
-SUMMARY_COLOR  = "#F7E759"
-
-## Stim settings
-BUTTON_COLORS = ["#9E005D", "#2E5892", "#F7931E"]
-
-BUTTON_SIZE  = [250, 250]
-STATUS_SIZE  = [100, 90]
-AVATAR_SIZE  = [200, 200]
-PROFILE_SIZE = [300, 300]
-
-## Screen positions
-BUTTON_POS = [[-500, 0],
-              [0, 0],
-              [500, 0]]
+PSAP_FILE = os.path.join(DIR_DATA, "%s-%s-%s-%s" % ("psap", exp_info["participant_id"], condition, exp_info["date_time"]) + ".csv")
+psap_log  = TrialLogger(PSAP_FILE, LOG_COLUMNS, flush_interval = LOG_FLUSH_INTERVAL,
+                        task = "psap", typed_format = TYPED_FORMAT)
 
-AVATAR_POS = [[-330,  170], [-110,  170], [110,  170], [330,  170],
-              [-330,  -50], [-110,  -50], [110,  -50], [330,  -50],
-              [-330, -270], [-110, -270], [110, -270], [330, -270]]
+## Session log for run-level information (timing summaries, scheduled and
+## actual times of adverse events and shield expiry)
+session_log = logging.LogFile(PSAP_FILE.replace(".csv", ".log"), level = logging.DATA, filemode = "w")
 
-CTRL_POS = [[BUTTON_POS[0][0], BUTTON_POS[0][1] - 200],
-            [BUTTON_POS[1][0], BUTTON_POS[1][1] - 200],
-            [BUTTON_POS[2][0], BUTTON_POS[2][1] - 200]]
+## Record every window flip and write a frame-timing file next to the session data
+FRAME_TIMING = False
+FRAME_FILE   = PSAP_FILE.replace(".csv", "-frames.csv")
 
-SCORE_POS  = [0, BUTTON_POS[0][1] + 370]
-COUNT_POS  = [SCORE_POS[0], SCORE_POS[1] - 70]
+if FRAME_TIMING:
+    frame_timer = FrameTimer(win)
 
-KEY_POS    = [SCORE_POS[0], -250]
-N_KEY_POS  = [KEY_POS[0] + 50, KEY_POS[1] - 70]
+## Decode every image once at display size
+## Avatars are also shown in the larger profile frame, so they use that size
+decode = stim_decoder(STIM_SOURCE)
 
-STATUS_POS = [SCORE_POS[0] - 135, COUNT_POS[1] - 5]
+stim_images = {}
+stim_images.update({path: decode(path, BUTTON_SIZE) for path in BUTTON_LIST})
+stim_images.update({path: decode(path, PROFILE_SIZE) for path in AVATAR_LIST + [PROFILE]})
+stim_images.update({path: decode(path, STATUS_SIZE) for path in [SHIELD, STEAL, GLITCH]})
 
 # DEFINE OBJECTS TO DRAW
 ## Text
-control_text = visual.TextStim(
+### One control label per button, under its button
+control_texts = [visual.TextStim(
     win,
+    text      = MSG_LIST[iButton],
     color     = "White",
     height    = CONTROL_SIZE,
     units     = "pix",
-    alignText = "center"
-)
+    alignText = "center",
+    pos       = CTRL_POS[iButton],
+    wrapWidth = BUTTON_SIZE[0]
+) for iButton in range(len(ACTION_LIST))]
 
 score_text = visual.TextStim(
     win,
@@ -369,15 +399,19 @@ launch_message = visual.TextStim(
 ## Images
 shield_icon = visual.ImageStim(
     win   = win,
-    image = SHIELD,
+    image = stim_images[SHIELD],
     size  = STATUS_SIZE,
     pos   = STATUS_POS
 )
 
-button = visual.ImageStim(
+### One stim per action button, built after the buttons are shuffled,
+### so redrawing the decision screen never loads a texture
+buttons = [visual.ImageStim(
     win   = win,
-    size  = BUTTON_SIZE    
-)
+    image = stim_images[BUTTON_LIST[iButton]],
+    size  = BUTTON_SIZE,
+    pos   = BUTTON_POS[iButton]
+) for iButton in range(len(ACTION_LIST))]
 
 status_icon = visual.ImageStim(
     win   = win,
@@ -387,19 +421,14 @@ status_icon = visual.ImageStim(
 
 incident_icon = visual.ImageStim(
     win   = win,
-    image = INCIDENT,
+    image = stim_images[INCIDENT],
     size  = STATUS_SIZE,
     pos   = STATUS_POS
 )
 
-avatar_a = visual.ImageStim(
-    win   = win,
-    size  = AVATAR_SIZE
-)
-
 profile_opponent = visual.ImageStim(
     win   = win,
-    image = PROFILE,
+    image = stim_images[PROFILE],
     pos   = [250, -100],
     size  = PROFILE_SIZE
 )
@@ -410,36 +439,28 @@ profile_player = visual.ImageStim(
     size  = PROFILE_SIZE
 )
 
-### List of possible avatars 
-avatar_l = avatar_k = avatar_j = avatar_i = avatar_h = avatar_g = avatar_f = avatar_e = avatar_d = avatar_c = avatar_b = avatar_a
-
-AVATARS = [avatar_a, avatar_b, avatar_c, avatar_d, avatar_e, avatar_f, 
-           avatar_g, avatar_h, avatar_i, avatar_j, avatar_k, avatar_l]
+### Grid of possible avatars, one stim per avatar
+avatar_grid = AvatarGrid(win, [stim_images[path] for path in AVATAR_LIST], AVATAR_POS, AVATAR_SIZE)
 
 # DEFINE TASK ROUTINES
 ## Connection stage
 ### Avatar selection
-def choose_avatar(icons =  AVATARS, player_frame = profile_player):
-    show_images = True
-
-    while show_images == True:
-        for iImage, avatar in enumerate(icons):
-            avatar.setImage(AVATAR_LIST[iImage])
-            avatar.setPos(AVATAR_POS[iImage])
-            avatar.clicked = False
-            avatar.draw()
-        
-            if mouse.isPressedIn(avatar, buttons=[0]):
-                player_frame.setImage(avatar.image)
-                show_images = False
-        
-        avatar_message.draw()
+@routine("choose_avatar")
+def choose_avatar(icons = avatar_grid, player_frame = profile_player):
+    chosen = None
 
+    while chosen is None:
+        icons.draw()
+        avatar_message.draw()
         win.flip()
-    
+
+        chosen = icons.clicked(mouse)
+
+    player_frame.setImage(icons.images[chosen])
     core.wait(0.4)
 
 ### Wait for connection from other player
+@routine("connection_screen", animated = False)
 def connection_screen(wait_time = 3):
     wait_connection.autoDraw = profile_player.autoDraw = True
     win.flip()
@@ -452,6 +473,7 @@ def connection_screen(wait_time = 3):
     
 
 ### Wait for players to be ready
+@routine("ready_screen", animated = False)
 def ready_screen(wait_time = 2):
     wait_players.autoDraw = ready_control.autoDraw = profile_player.autoDraw = profile_opponent.autoDraw = True    
     profile_player.opacity = profile_opponent.opacity = 0.5    
@@ -460,7 +482,7 @@ def ready_screen(wait_time = 2):
     profile_opponent.opacity = 1
     ready_opponent.autoDraw = True
     win.flip()
-    event.waitKeys(keyList = ["return"])
+    keyboard.wait_keys([KEY_NEXT])
     core.wait(wait_time/5)
     profile_player.opacity = 1
     ready_player.autoDraw = True
@@ -470,6 +492,7 @@ def ready_screen(wait_time = 2):
     win.flip()
 
 ### Launch the task
+@routine("launcher_screen", animated = False)
 def launcher_screen(wait_time = 3):
     launch_message.draw()
     win.flip()
@@ -481,13 +504,8 @@ def launcher_screen(wait_time = 3):
 ### Show actions and controls
 def display_controls(actions):
     for iButton in range(len(actions)):
-        button.setImage(BUTTON_LIST[iButton])
-        button.pos = BUTTON_POS[iButton]
-        control_text.setText(MSG_LIST[iButton])
-        control_text.pos = CTRL_POS[iButton]
-        control_text.wrapWidth = BUTTON_SIZE[0]
-        control_text.draw()
-        button.draw()
+        control_texts[iButton].draw()
+        buttons[iButton].draw()
 
 ### Score counter        
 def display_score(score, color = "White", size = SCORE_SIZE, bold = False):
@@ -512,15 +530,8 @@ def key_press_action(key_pressed):
 
 ### Show only the button corresponding to the action selected
 def display_action(action):
-    button.setImage(BUTTON_LIST[action])
-    button.pos = BUTTON_POS[action]
-    
-    control_text.setText(MSG_LIST[action])
-    control_text.pos       = CTRL_POS[action]
-    control_text.wrapWidth = BUTTON_SIZE[0]
-    
-    control_text.autoDraw  = True
-    button.autoDraw = True
+    control_texts[action].draw()
+    buttons[action].draw()
 
 ### Key press counter
 def display_action_count(action, count, color = "White", size = N_KEY_SIZE):
@@ -534,27 +545,19 @@ def display_action_count(action, count, color = "White", size = N_KEY_SIZE):
     action_text.draw()
     action_counter.draw()
 
-### Wrapper that keeps state until the key press threshold is met
-def action_trigger(action, n_pressed, threshold = 10):
-    display_action(ACTION_LIST.index(action))
-    win.flip()
-    threshold_met = False
+### Record the presses of the selected key until the press threshold is met
+### keys are (key, time) pairs; presses of other keys are ignored, as are
+### presses past the threshold. Returns the number of presses so far
+def action_trigger(action, press_times, keys, threshold = 10):
+    for key, key_time in keys:
+        if len(press_times) < threshold and key_press_action(key) == action:
+            press_times.append(key_time)
 
-    while not threshold_met:
-        display_action_count(action, n_pressed)
-        win.flip()
-        pressed = event.waitKeys(keyList = KEY_LIST[ACTION_LIST.index(action)])
-       
-        if key_press_action(pressed[0]) == action:
-            n_pressed += 1
-            
-            if n_pressed == threshold:
-                control_text.autoDraw = False
-                button.autoDraw       = False
-                threshold_met         = True
+    return len(press_times)
 
 ## Final summary
 ## Shows final score
+@routine("show_summary", animated = False)
 def show_summary(score, practice = False):
     if practice == True:
         final_message.setText("End of the Practice Round")
@@ -579,18 +582,28 @@ def show_summary(score, practice = False):
         final_message.draw()
     
     win.flip()
-    event.waitKeys(5, "enter")
+    keyboard.wait_keys([KEY_NEXT], max_wait = 5)
 
+### Set the outcome or incident message drawn by the main loop
 def show_incident(message, color):
     incident_message.setText(message)
     incident_message.color = color
-    incident_message.pos   = [0, 100]
-    incident_message.draw()
+    incident_message.pos   = MESSAGE_POS
+
+## Session summaries
+def log_session_stats():
+    """Write the frame-timing summary to the session log."""
+    if FRAME_TIMING:
+        for row in frame_timer.save(FRAME_FILE):
+            logging.data("Frame times [{routine}]: {frames} frames, p50 {p50_ms} ms, "
+                         "p95 {p95_ms} ms, p99 {p99_ms} ms, {cpu_ms} ms CPU, {dropped} dropped".format(**row))
+    logging.flush()
 
 # MAIN ROUTINE
+@routine("psap", animated = False)
 def psap():
     if test_run == False:
-        choose_avatar(icons =  AVATARS, player_frame = profile_player)        
+        choose_avatar(icons = avatar_grid, player_frame = profile_player)        
 
         ### wait for connection
         connection_screen()
@@ -602,200 +615,253 @@ def psap():
         launcher_screen()
 
     ## Initialize the event states and counters
-    task_finished = False
-    shielded      = False
-    
+    ### Each decision counts as a trial in this setup: a decision screen,
+    ### the presses of the chosen action and the outcome message
+    phase      = "decision"
+    last_trial = False
+    shielded   = False
+    redraw     = True
+
     incident_counter = 0
     incident_time    = 0
+    incident_due     = 0
+    incident_active  = False
+    incident_pending = None  # due time of an adverse event blocked by the shield
+    shown_events     = []    # (event, due time) pairs logged once they are on screen
 
     score = 0
 
     ## Define event time thresholds
     ### Practice rounds get fixed timers
-    if test_run == False:
-        
-        ### Opponent steals
-        if condition == "A":
-            adverse_time_threshold = random.uniform(6, 60)
-        
-        ### Random glitch
-        elif condition == "B":
-            adverse_time_threshold = random.uniform(400, 500)
-        
-        ### Neutral, no negative events
-        elif condition == "C":
-            adverse_time_threshold = 100000
-    
-        shield_time_threshold = random.uniform(4, 5.8)
-        
-    elif test_run == True:
-        adverse_time_threshold = 20
-        shield_time_threshold  = 4
-
-    ## Define clocks for task events
-    task_clock    = core.Clock()
-    shield_clock  = core.Clock()
-    adverse_clock = core.Clock()
-
-    ## Main loop runs for the amount of time defined as task duration    
-    ### Each decision counts as a trial in this setup
-    while not task_finished:
-        trial_start_time = task_clock.getTime()
-        outcome_interval = random.uniform(0.9, 1.1) #how long to display result
-        
-        ### End task trigger
-        if trial_start_time > TASK_DURATION:
-            task_finished = True
-
-        ### Steal/Glitch trigger
-        ### Both the timer and threshold for adverse events are reset 
-        ### after the negative state is triggered.
-        if adverse_clock.getTime() > adverse_time_threshold and shielded == False:
+    adverse_time_threshold = adverse_threshold(condition, test_run)
+    shield_time_threshold  = first_shield_threshold(test_run)
+
+    ## Timers run on the task clock and are checked on every pass of the loop,
+    ## so adverse events and shield expiry show up within a frame of being due
+    task_clock.reset()
+    keyboard.clear()
+    scheduler = EventScheduler()
+    scheduler.schedule("adverse", adverse_time_threshold)
+
+    trial_start_time = None  # set by the flip that shows the decision screen
+    decision_paused  = 0     # time incidents paused the decision screen of this trial
+    incident_start   = None  # when the incident on screen was triggered
+    outcome_end      = None  # when the outcome message on screen is taken down
+    outcome_message  = None
+    outcome_color    = None
+    display_score(score)
+
+    ## Main loop runs for the amount of time defined as task duration
+    while True:
+        now = task_clock.getTime()
+
+        ### Timer events
+        for name, due in scheduler.pop_due(now):
+            ### End of the incident message
+            ### An outcome message on screen is extended by the time the incident took,
+            ### and the time it paused a decision screen is left out of the response time
+            if name == "incident_end":
+                incident_icon.autoDraw = False
+                incident_active = False
+                redraw = True
+                scheduler.schedule("adverse", now + adverse_time_threshold)
+                display_score(score)
+
+                if phase == "outcome":
+                    outcome_end += now - incident_start
+                    show_incident(outcome_message, outcome_color)
+                elif phase == "decision" and trial_start_time is not None:
+                    decision_paused += now - incident_start
+                continue
+
+            ### Hide the shield after the protection timeout; an adverse event
+            ### blocked by the shield is triggered now
+            if name == "shield":
+                shield_time_threshold = next_shield_threshold()
+                shield_icon.autoDraw  = False
+                shielded = False
+                redraw   = True
+                shown_events.append(("Shield expired", due))
+
+                if incident_pending is None:
+                    continue
+                due, incident_pending = incident_pending, None
+
+            elif shielded:
+                incident_pending = due
+                continue
+
+            ### Steal/Glitch trigger
+            ### The adverse timer restarts when the incident message is gone,
+            ### with a new threshold
             incident_counter += 1
-            incident_time = task_clock.getTime()
-
-            ### Adverse event in actual experiment
-            if test_run == False:
-            
-                ### Opponent steals
-                if condition == "A":
-                    score -= 1
-                    show_incident(f"Player {OPPONENT_NAME}\nstole from you!", LOST_COLOR) 
-                    adverse_time_threshold = random.uniform(6, 60)
-                
-                ### Glitch halves points
-                elif condition == "B":
-                    show_incident(f"System Error! You lost {score/2:.2f} points", LOST_COLOR) 
-                    score = score/2
-                    adverse_time_threshold = random.uniform(400, 500)
-
-                ### Show outcome
-                incident_icon.autoDraw = True
-                display_score(score, color = LOST_COLOR, size = SCORE_SIZE, bold = True)
-                win.flip()
-
-                core.wait(outcome_interval)
+            incident_due = due
 
-                incident_icon.autoDraw = False
-                adverse_clock.reset()
-
-            ### Adverse event during practice
-            ### This is designed to show both the glitch and steal scenarios
-            ### Regardless of the conditions chose, this is triggered
-            elif test_run == True:
-                
-                ### Alternate between steal and glitch
-                if incident_counter % 2 == 0:
-                    score -= 1
-                    show_incident(f"Participant {OPPONENT_NAME}\nstole from you!", LOST_COLOR) 
-                    adverse_time_threshold = 20
-                    incident_icon.setImage(os.path.join(DIR_STIM, "steal.png"))
-                
-                else:
-                    show_incident(f"System Error! You lost {score/2:.2f} points", LOST_COLOR) 
-                    score = score/2
-                    adverse_time_threshold = 20
-                    incident_icon.setImage(os.path.join(DIR_STIM, "glitch.png"))
-
-                ### Show outcome 
-                incident_icon.autoDraw = True
-                display_score(score, color = LOST_COLOR, size = SCORE_SIZE, bold = True)
-                win.flip()
-                
-                core.wait(outcome_interval)
-                
-                incident_icon.autoDraw = False
-                adverse_clock.reset()
-            
-        ### Reset shield timer and hide icon after protection timeout
-        ### This is only triggered when there is a shield in the screen
-        if shield_clock.getTime() > shield_time_threshold and shielded == True: 
-            shield_time_threshold = random.uniform(4.5, 5.5)
-            shield_icon.autoDraw  = False
-            shield_clock.reset()
-            shielded = False
-
-        ### Show decision screen
-        ### Participant can choose one of three actions
-        display_controls(ACTION_LIST)
-        display_score(score)
-        win.flip()
+            ### Practice alternates between steal and glitch, regardless
+            ### of the condition, to show both scenarios
+            incident = incident_kind(condition, test_run, incident_counter)
 
-        ### Wait for participant input
-        key_response = event.waitKeys(keyList = KEY_LIST + [KEY_QUIT])
+            ### Opponent steals
+            if incident == "steal":
+                if test_run == True:
+                    show_incident(f"Participant {OPPONENT_NAME}\nstole from you!", LOST_COLOR)
+                    incident_icon.setImage(stim_images[STEAL])
+                else:
+                    show_incident(f"Player {OPPONENT_NAME}\nstole from you!", LOST_COLOR)
+
+            ### Glitch halves points
+            else:
+                show_incident(f"System Error! You lost {score/2:.2f} points", LOST_COLOR)
+                if test_run == True:
+                    incident_icon.setImage(stim_images[GLITCH])
+
+            score = apply_incident(incident, score)
+            adverse_time_threshold = adverse_threshold(condition, test_run)
+
+            ### Show the incident; it pauses the trial in progress
+            incident_icon.autoDraw = True
+            display_score(score, color = LOST_COLOR, size = SCORE_SIZE, bold = True)
+            incident_start  = now
+            incident_active = True
+            redraw = True
+            shown_events.append((f"Incident {incident_counter} ({incident})", due))
+            scheduler.schedule("incident_end", now + display_interval())
+
+        ### Participant input, timestamped on the task clock
+        ### Key presses made while an incident is on screen are discarded
+        keys = keyboard.get_keys(KEY_LIST + [KEY_QUIT])
 
         ### Option to quit the task
-        if key_response[0] == KEY_QUIT:  
+        if KEY_QUIT in [key for key, _ in keys]:
+            psap_log.close()
+            log_session_stats()
             return
-        
-        action = key_press_action(key_response[0])
 
-        ### Start press counter
-        n_pressed = 1
-        
-        ### Define the number of times a button needs to be pressed
-        ### to trigger the specific action.
-        if action == "Earn":
-            press_threshold = 30
-        
-        else:
-            press_threshold = 10
+        if not incident_active:
+            ### Decision screen: the first key pressed after the screen was shown
+            ### chooses the action and counts as its first press
+            if phase == "decision":
+                keys = [(key, key_time) for key, key_time in keys
+                        if trial_start_time is not None and key_time >= trial_start_time]
+
+            if phase == "decision" and keys:
+                key_response = [keys[0][0]]
+                action       = key_press_action(key_response[0])
+                threshold    = press_threshold(action)
+                press_times  = [keys[0][1]]
+                keys         = keys[1:]
+                phase  = "pressing"
+                redraw = True
+
+            ### Pressing screen: hides the other buttons and shows the counter
+            ### until the press threshold (30 to earn, 10 otherwise) is met
+            if phase == "pressing" and keys:
+                action_trigger(action, press_times, keys, threshold)
+                redraw = True
+
+            if phase == "pressing" and len(press_times) >= threshold:
+                ### The action is completed by its last press
+                trial_stop_time = press_times[-1]
+
+                ### Gather data and queue it for writing
+                psap_log.log(id              = exp_info["participant_id"],
+                             condition       = condition,
+                             color_01        = os.path.basename(BUTTON_LIST[0]).split(".")[0].split("_")[1],
+                             color_02        = os.path.basename(BUTTON_LIST[1]).split(".")[0].split("_")[1],
+                             color_03        = os.path.basename(BUTTON_LIST[2]).split(".")[0].split("_")[1],
+                             action_01       = ACTION_LIST[0],
+                             action_02       = ACTION_LIST[1],
+                             action_03       = ACTION_LIST[2],
+                             choice          = key_response,
+                             n_incidents     = incident_counter,
+                             t_last_incident = incident_time,
+                             t_incident_due  = incident_due,
+                             start           = trial_start_time,
+                             end             = trial_stop_time,
+                             rt              = press_times[0] - trial_start_time - decision_paused,
+                             press_times     = pack_times(press_times, trial_start_time))
+
+                ### Display action outcome
+                ### Choosing to protect or deduct restarts the adverse event timer
+                if action == "Earn":
+                    score += 1
+                    outcome_message, outcome_color = "You earned 1 point!", EARNINGS_COLOR
+                    display_score(score, color = EARNINGS_COLOR, size = SCORE_SIZE, bold = True)
+
+                elif action == "Protect":
+                    shield_icon.autoDraw = True
+                    shielded         = True
+                    incident_pending = None
+                    outcome_message, outcome_color = "Your points are protected\nfor some time", SHIELDED_COLOR
+                    display_score(score, color = SHIELDED_COLOR, size = SCORE_SIZE, bold = True)
+                    scheduler.schedule("shield", now + shield_time_threshold)
+                    scheduler.schedule("adverse", now + adverse_time_threshold)
+
+                elif action == "Deduct":
+                    incident_pending = None
+                    outcome_message, outcome_color = "You deducted 1 point\nfrom your opponent!", SUMMARY_COLOR
+                    scheduler.schedule("adverse", now + adverse_time_threshold)
+
+                show_incident(outcome_message, outcome_color)
+
+                outcome_end = now + display_interval() # how long to display result
+                phase  = "outcome"
+                redraw = True
+
+            ### ITI, then the next decision
+            ### The trial that starts after the task duration is the last one
+            elif phase == "outcome" and now >= outcome_end:
+                if last_trial:
+                    break
+
+                trial_start_time = None
+                decision_paused  = 0
+                last_trial       = now > TASK_DURATION
+                display_score(score)
+                ### Presses of the last trial are not carried into the next decision
+                keyboard.clear()
+                phase  = "decision"
+                redraw = True
+
+        ### Draw the current screen, or wait for the next poll
+        if redraw:
+            if incident_active:
+                set_routine("incident")
+                incident_message.draw()
+            elif phase == "decision":
+                set_routine("decision")
+                display_controls(ACTION_LIST)
+            elif phase == "pressing":
+                set_routine("pressing")
+                display_action(ACTION_LIST.index(action))
+                display_action_count(action, len(press_times))
+            else:
+                set_routine("outcome")
+                incident_message.draw()
 
-        ### Show the pressing action screen
-        ### This hides the other buttons and shows the counter until
-        ### the press threshold is met
-        action_trigger(action, n_pressed, press_threshold)
-        
-        ### Get time once the action is completed
-        trial_stop_time = clock.getTime()
-
-        ### Gather data and record on file
-        temp_data = [str(exp_info["participant_id"]),
-                     str(condition), 
-                     str(os.path.basename(BUTTON_LIST[0]).split(".")[0].split("_")[1]),
-                     str(os.path.basename(BUTTON_LIST[1]).split(".")[0].split("_")[1]),
-                     str(os.path.basename(BUTTON_LIST[2]).split(".")[0].split("_")[1]),
-                     str(ACTION_LIST[0]),
-                     str(ACTION_LIST[1]),
-                     str(ACTION_LIST[2]),
-                     str(key_response),
-                     str(incident_counter),
-                     str(incident_time),
-                     str(trial_start_time),
-                     str(trial_stop_time)]
-        
-        temp_data = ",".join(temp_data)
-        temp_data = temp_data + "\n"
-        psap_log.write(temp_data)
-
-        ### Display action outcome
-        ### Choosing to protect or deduct reset the adverse event clock
-        if action == "Earn":
-            score += 1
-            display_score(score, color = EARNINGS_COLOR, size = SCORE_SIZE, bold = True)
-            show_incident("You earned 1 point!", EARNINGS_COLOR)
             win.flip()
+            flip_time = task_clock.getTime()
+            redraw    = False
 
-        elif action == "Protect":
-            shield_icon.autoDraw = True
-            display_score(score, color = SHIELDED_COLOR, size = SCORE_SIZE, bold = True)
-            shielded = True
-            show_incident("Your points are protected\nfor some time", SHIELDED_COLOR)
-            win.flip()
-            adverse_clock.reset()
-            shield_clock.reset()
+            ### The trial starts when its decision screen is first shown
+            if phase == "decision" and not incident_active and trial_start_time is None:
+                trial_start_time = flip_time
 
-        elif action == "Deduct":
-            show_incident("You deducted 1 point\nfrom your opponent!", SUMMARY_COLOR)
-            win.flip()
-            adverse_clock.reset()
+            ### Scheduled and actual (first flip) times of timer events
+            if shown_events:
+                for label, due in shown_events:
+                    logging.data(f"{label}: due {due:.4f}, shown {flip_time:.4f}")
+                    if label.startswith("Incident"):
+                        incident_time = flip_time
+                shown_events = []
 
-        ### ITI
-        core.wait(outcome_interval)
+        else:
+            time.sleep(POLL_INTERVAL)
 
     ## Show final score
     show_summary(score, test_run)
     psap_log.close()
+    log_session_stats()
 
 def main():    
     psap()